@@ -45,6 +45,25 @@ class Settings(BaseSettings):
     scan_interval_seconds: int = 60
     speed_limit_min_delay: int = 30
     speed_limit_max_delay: int = 120
+    # Задержка между символами при наборе сообщений в чат (мс); 0 — вставка без имитации набора
+    typing_delay_ms: int = 30
+    # Имитировать набор только в первом сообщении заказа за сессию, дальше — вставка
+    typing_first_message_only: bool = True
+    # Сколько секунд переиспользовать прочитанную историю чата заказа (0 — без кэша)
+    chat_poll_ttl_s: float = 3.0
+    # Сколько секунд переиспользовать разобранную страницу заказа (0 — без кэша)
+    order_detail_ttl_s: float = 60.0
+    # Типы ресурсов сторонних доменов, которые не загружаются (через запятую,
+    # например "image,font,media"). Пусто — перехват выключен: route в Playwright
+    # отключает HTTP-кэш браузера
+    blocked_resource_types: str = ""
+    # Домены аналитики/рекламы, запросы к которым не отправляются (через
+    # запятую, подстрока хоста, например "mc.yandex,google-analytics").
+    # Непустое значение, как и blocked_resource_types, включает route
+    blocked_hosts: str = ""
+    # Собирать стек Playwright-вызовов без чтения исходников (быстрее каждый
+    # API-вызов; имена API и строки в ошибках сохраняются)
+    playwright_lazy_stacks: bool = True
 
     # Stop-gate: запрещённые типы работ (через запятую)
     banned_work_types: str = ""
@@ -56,6 +75,16 @@ class Settings(BaseSettings):
             return []
         return [t.strip() for t in self.banned_work_types.split(",") if t.strip()]
 
+    @property
+    def blocked_resource_types_set(self) -> frozenset[str]:
+        """Парсинг строки blocked_resource_types в множество."""
+        return frozenset(t.strip() for t in self.blocked_resource_types.split(",") if t.strip())
+
+    @property
+    def blocked_hosts_list(self) -> tuple[str, ...]:
+        """Парсинг строки blocked_hosts в кортеж подстрок хоста."""
+        return tuple(h.strip() for h in self.blocked_hosts.split(",") if h.strip())
+
     model_config = {"env_file": ".env", "env_file_encoding": "utf-8"}
 
 
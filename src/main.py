@@ -242,7 +242,7 @@ async def scan_orders_job() -> None:
         return
 
     from src.scraper.auth import login
-    from src.scraper.orders import fetch_order_list
+    from src.scraper.orders import iter_order_list
     from src.scraper.order_detail import fetch_order_detail
     from src.scraper.bidder import place_bid
     from src.scraper.file_handler import download_files
@@ -257,6 +257,7 @@ async def scan_orders_job() -> None:
 
     await _track_task()
     _page_locked = False
+    order_summaries = None
     try:
         page = await _retry_async(login)
         await browser_manager.page_lock.acquire()
@@ -288,14 +289,11 @@ async def scan_orders_job() -> None:
             )
             return
 
-        order_summaries = await _retry_async(fetch_order_list, page)
-        if not order_summaries:
-            await _log_action("scan", "Новых заказов не найдено")
-            return
-
-        await _log_action("scan", f"Найдено {len(order_summaries)} заказов")
-
-        for summary in order_summaries:
+        # Заказы приходят по мере разбора ленты: обработка первой страницы
+        # идёт, пока страницы 2..N грузятся на своих вкладках
+        order_summaries = iter_order_list(page)
+        found = 0
+        async for summary in order_summaries:
             # Проверяем бан, shutdown и bot_running на каждой итерации
             if is_banned() or _shutting_down or not bot_running:
                 break
@@ -308,6 +306,9 @@ async def scan_orders_job() -> None:
                 await _log_action("antiban", f"Лимит ставок ({MAX_DAILY_BIDS}) достигнут в процессе сканирования")
                 break
 
+            # Считаем только заказы, дошедшие до обработки
+            found += 1
+
             try:
                 # Быстрая in-memory дедупликация (без обращения к БД)
                 if summary.order_id in _seen_order_ids:
@@ -598,6 +599,11 @@ async def scan_orders_job() -> None:
                 logger.error("Ошибка обработки заказа %s: %s", summary.order_id, e)
                 await _log_action("error", f"Ошибка обработки заказа #{summary.order_id}: {e}")
 
+        if found:
+            await _log_action("scan", f"Найдено {found} заказов")
+        else:
+            await _log_action("scan", "Новых заказов не найдено")
+
     except Exception as e:
         logger.error("Критическая ошибка в scan_orders_job: %s", e)
         await _log_action("error", f"Критическая ошибка сканирования: {e}")
@@ -612,6 +618,9 @@ async def scan_orders_job() -> None:
         except Exception:
             pass
     finally:
+        # Прерванный перебор (бан, лимит ставок) — снять воркеры страниц ленты
+        if order_summaries is not None:
+            await order_summaries.aclose()
         if _page_locked:
             browser_manager.page_lock.release()
         await _untrack_task()
@@ -660,7 +669,9 @@ async def process_accepted_orders_job() -> None:
                 try:
                     detail_url = f"/order/getoneorder/{order.avtor24_id}"
                     async with browser_manager.page_lock:
-                        detail = await _retry_async(fetch_order_detail, page, detail_url)
+                        detail = await _retry_async(
+                            fetch_order_detail, page, detail_url, force_refresh=True,
+                        )
                     if detail:
                         upd = {}
                         if detail.title and detail.title != order.title:
@@ -1024,7 +1035,7 @@ async def _handle_assistant_messages(
             try:
                 from src.scraper.order_detail import fetch_order_detail
                 detail_url = f"/order/getoneorder/{avtor24_id}"
-                detail = await fetch_order_detail(page, detail_url)
+                detail = await fetch_order_detail(page, detail_url, force_refresh=True)
                 if detail and detail.description:
                     update_kwargs["description"] = detail.description
                     logger.info("Описание перечитано со страницы для %s", avtor24_id)
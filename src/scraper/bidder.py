@@ -11,6 +11,9 @@ from src.scraper.browser import browser_manager
 
 logger = logging.getLogger(__name__)
 
+# Поле цены ставки (реальный селектор: #MakeOffer__inputBid)
+_PRICE_INPUT = '#MakeOffer__inputBid, input[id*="inputBid"]'
+
 
 async def place_bid(page: Page, order_url: str, price: int, comment: str) -> bool:
     """Поставить ставку на заказ.
@@ -29,17 +32,20 @@ async def place_bid(page: Page, order_url: str, price: int, comment: str) -> boo
         current = page.url
         if order_url not in current:
             await page.goto(order_url, wait_until="domcontentloaded", timeout=30000)
-            await browser_manager.short_delay()
+            # Ждём появления поля ставки вместо фиксированной паузы
+            try:
+                await page.wait_for_selector(_PRICE_INPUT, timeout=15000)
+            except Exception:
+                pass
 
         # Заполняем цену (реальный селектор: #MakeOffer__inputBid)
-        price_input = page.locator(
-            '#MakeOffer__inputBid, input[id*="inputBid"]'
-        )
+        price_input = page.locator(_PRICE_INPUT)
         if await price_input.count() == 0:
             logger.error("Не найдено поле для ввода ставки на %s", order_url)
             return False
 
         await price_input.first.fill(str(price))
+        # Паузы между полями — антибан (темп человека), а не ожидание загрузки
         await browser_manager.short_delay()
 
         # Заполняем комментарий (реальный селектор: #makeOffer_comment)
@@ -63,6 +69,8 @@ async def place_bid(page: Page, order_url: str, price: int, comment: str) -> boo
 
         # Ждём подтверждения (редирект или появление сообщения об успехе)
         await page.wait_for_load_state("domcontentloaded", timeout=10000)
+        # Сообщение об ошибке ставки появляется после ответа сервера без
+        # смены страницы — пауза перед проверкой нужна
         await browser_manager.short_delay()
 
         # Проверяем успешность (ищем сообщение об ошибке)
@@ -1,12 +1,17 @@
 """Playwright browser manager — singleton, прокси, UA ротация, случайные задержки, антибан."""
 
 import asyncio
+import inspect
 import random
 import json
 import logging
 import re
+import sys
+import traceback
+import types
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Optional
+from typing import AsyncIterator, Optional
 from urllib.parse import urlparse
 
 from playwright.async_api import async_playwright, Browser, BrowserContext, Page, Locator
@@ -37,6 +42,145 @@ VIEWPORTS = [
 
 COOKIES_PATH = Path("cookies.json")
 
+# JS-хелперы Автор24 (window.__a24) — регистрируются init-скриптом контекста
+CHAT_HELPERS_PATH = Path(__file__).with_name("chat_helpers.js")
+CHAT_HELPERS_JS = CHAT_HELPERS_PATH.read_text(encoding="utf-8")
+
+
+async def call_helper(page: Page, name: str, arg=None):
+    """Вызвать JS-хелпер window.__a24.<name> (см. chat_helpers.js).
+
+    Хелперы регистрируются init-скриптом контекста; если страница была
+    открыта раньше и их нет — внедряем один раз и повторяем вызов.
+    """
+    expression = f"(arg) => window.__a24 && window.__a24.{name}(arg)"
+    result = await page.evaluate(expression, arg)
+    if result is None:
+        await page.evaluate(CHAT_HELPERS_JS)
+        result = await page.evaluate(expression, arg)
+    return result
+
+
+# Общие ожидания готовности страниц Автор24 (chat, file_handler).
+# Не падают по таймауту — возвращают False, решение за вызывающим.
+
+# Страница заказа отрисована: поле чата, сообщения или форма ставки
+ORDER_PAGE_READY = '#root textarea, [class*="GroupItem"], #MakeOffer__inputBid'
+
+
+async def wait_for_selector(
+    page: Page, selector: str, state: str = "visible", timeout: int = 5000,
+) -> bool:
+    """Дождаться состояния элемента. При таймауте не падаем — возвращаем False."""
+    try:
+        await page.wait_for_selector(selector, state=state, timeout=timeout)
+        return True
+    except Exception as e:
+        logger.debug("Не дождались '%s' (%s): %s", selector, state, e)
+        return False
+
+
+async def wait_for_function(
+    page: Page, expression: str, timeout: int = 5000, polling="raf", arg=None,
+) -> bool:
+    """Дождаться истинности JS-выражения. При таймауте возвращает False.
+
+    polling — "raf" (каждый кадр) или интервал в мс для дорогих выражений;
+    arg передаётся в выражение-функцию.
+    """
+    try:
+        await page.wait_for_function(expression, arg=arg, timeout=timeout, polling=polling)
+        return True
+    except Exception as e:
+        logger.debug("Не дождались условия '%s': %s", expression, e)
+        return False
+
+
+async def wait_for_network_idle(page: Page, timeout: int = 5000) -> bool:
+    """Дождаться окончания XHR (networkidle). При таймауте возвращает False."""
+    try:
+        await page.wait_for_load_state("networkidle", timeout=timeout)
+        return True
+    except Exception as e:
+        logger.debug("Не дождались networkidle: %s", e)
+        return False
+
+
+def order_page_url(order_id: str) -> str:
+    """URL страницы заказа (где живёт чат)."""
+    return f"{settings.avtor24_base_url}/order/getoneorder/{order_id}"
+
+
+async def ensure_order_page(page: Page, order_id: str) -> None:
+    """Убедиться что мы на странице нужного заказа."""
+    current = page.url
+    if f"/order/getoneorder/{order_id}" not in current:
+        # commit: готовность React определяет ожидание разметки, а не DCL
+        await page.goto(order_page_url(order_id), wait_until="commit", timeout=30000)
+        await wait_for_selector(page, ORDER_PAGE_READY, timeout=10000)
+
+
+async def dismiss_any_overlay(page: Page) -> None:
+    """Закрыть модальные окна/оверлеи если есть."""
+    try:
+        overlay = page.locator('[class*="Overlay"]')
+        if await overlay.count() > 0:
+            # Попробуем нажать Escape
+            await page.keyboard.press("Escape")
+            await wait_for_selector(page, '[class*="Overlay"]', state="hidden", timeout=2000)
+    except Exception:
+        pass
+
+
+def _lazy_inspect_stack(context: int = 1) -> list[inspect.FrameInfo]:
+    """inspect.stack() без чтения исходников (context=0): только кадры."""
+    return inspect.getouterframes(sys._getframe(1), 0)
+
+
+def _lazy_extract_stack(f=None, limit=None) -> traceback.StackSummary:
+    """traceback.extract_stack() без linecache: строки читаются при форматировании."""
+    if f is None:
+        f = sys._getframe(1)
+    stack = traceback.StackSummary.extract(
+        traceback.walk_stack(f), limit=limit, lookup_lines=False,
+    )
+    stack.reverse()
+    return stack
+
+
+def _patch_playwright_stacks() -> bool:
+    """Облегчить сбор стека, который Playwright делает на каждый API-вызов.
+
+    playwright-python вызывает inspect.stack() и traceback.extract_stack()
+    перед каждым goto/evaluate/locator-запросом, и оба читают исходники
+    всех кадров. Подменяем их только в пространствах имён модулей Playwright:
+    кадры (имя API, файл, строка — для ошибок и трейсинга) остаются, чтение
+    исходников — нет. Приватный API: если его нет, патч пропускается.
+    """
+    try:
+        from playwright._impl import _connection, _network
+    except ImportError:
+        return False
+    lazy_inspect = types.ModuleType("inspect")
+    lazy_inspect.__dict__.update(inspect.__dict__)
+    lazy_inspect.stack = _lazy_inspect_stack
+    lazy_traceback = types.ModuleType("traceback")
+    lazy_traceback.__dict__.update(traceback.__dict__)
+    lazy_traceback.extract_stack = _lazy_extract_stack
+    patched = False
+    for module in (_connection, _network):
+        if getattr(module, "inspect", None) is inspect:
+            module.inspect = lazy_inspect
+            patched = True
+        if getattr(module, "traceback", None) is traceback:
+            module.traceback = lazy_traceback
+            patched = True
+    return patched
+
+
+if settings.playwright_lazy_stacks:
+    _patch_playwright_stacks()
+
 
 class BrowserManager:
     """Singleton менеджер Playwright-браузера."""
@@ -46,13 +190,15 @@ class BrowserManager:
         self._browser: Optional[Browser] = None
         self._context: Optional[BrowserContext] = None
         self._page: Optional[Page] = None
+        self._page_alive: bool = False
         self._user_agent: str = random.choice(USER_AGENTS)
         self._viewport: dict = random.choice(VIEWPORTS)
         self._page_lock: asyncio.Lock = asyncio.Lock()
 
     async def start(self) -> Page:
         """Запуск браузера и создание страницы."""
-        if self._page and not self._page.is_closed():
+        # Флаг поддерживается обработчиком события "close" — без CDP round-trip
+        if self._page_alive:
             return self._page
 
         self._playwright = await async_playwright().start()
@@ -99,7 +245,13 @@ class BrowserManager:
         else:
             self._context = await self._browser.new_context(**context_args)
 
+        # Хелперы парсятся V8 один раз на документ, evaluate вызывает их по имени
+        await self._context.add_init_script(CHAT_HELPERS_JS)
+        await self._block_resources(self._context)
+
         self._page = await self._context.new_page()
+        self._page_alive = True
+        self._page.on("close", lambda _: setattr(self, "_page_alive", False))
 
         # Скрытие webdriver-флага
         await self._page.add_init_script(
@@ -109,6 +261,65 @@ class BrowserManager:
         logger.info("Браузер запущен: UA=%s, viewport=%s", self._user_agent, self._viewport)
         return self._page
 
+    async def _block_resources(self, context: BrowserContext) -> None:
+        """Не загружать картинки/шрифты/медиа сторонних доменов (settings.blocked_resource_types)
+        и любые запросы к хостам аналитики (settings.blocked_hosts).
+
+        Скраперу нужны только DOM и текст чата. Ресурсы Автор24 и его
+        поддоменов не блокируются.
+        """
+        blocked = settings.blocked_resource_types_set
+        blocked_hosts = settings.blocked_hosts_list
+        if not blocked and not blocked_hosts:
+            return
+        own_host = urlparse(settings.avtor24_base_url).hostname or ""
+
+        async def handler(route) -> None:
+            request = route.request
+            host = urlparse(request.url).hostname or ""
+            own = host == own_host or host.endswith("." + own_host)
+            if not own and (
+                request.resource_type in blocked
+                or any(h in host for h in blocked_hosts)
+            ):
+                await route.abort()
+            else:
+                await route.continue_()
+
+        await context.route("**/*", handler)
+
+    async def _new_tab(self) -> Page:
+        """Новая вкладка в основном контексте (общие cookies и init-скрипты)."""
+        if self._context is None:
+            await self.start()
+        page = await self._context.new_page()
+        await page.add_init_script(
+            "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
+        )
+        return page
+
+    @asynccontextmanager
+    async def order_page(self, url: Optional[str] = None) -> AsyncIterator[Page]:
+        """Короткоживущая вкладка в основном контексте, закрывается на выходе.
+
+        Отдельный BrowserContext не создаётся, storage_state не копируется.
+        Если передан url, навигация на него уже закоммичена (готовность
+        разметки проверяет вызывающий). Ограниченное время жизни
+        не даёт вкладке копить отсоединённые DOM-узлы.
+        """
+        page = await self._new_tab()
+        try:
+            if url:
+                if not url.startswith("http"):
+                    url = settings.avtor24_base_url + url
+                await page.goto(url, wait_until="commit", timeout=30000)
+            yield page
+        finally:
+            try:
+                await page.close()
+            except Exception as e:
+                logger.debug("Ошибка закрытия вкладки заказа: %s", e)
+
     async def save_cookies(self) -> None:
         """Сохранить cookies в файл."""
         if self._context is None:
@@ -186,6 +397,7 @@ class BrowserManager:
             await self._playwright.stop()
             self._playwright = None
         self._page = None
+        self._page_alive = False
         logger.info("Браузер закрыт")
 
 
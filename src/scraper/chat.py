@@ -5,80 +5,111 @@
 """
 
 import asyncio
+import json
 import logging
 import re
-from dataclasses import dataclass
+import time
+from dataclasses import dataclass, field
 from typing import Optional
 
 from playwright.async_api import Page
 
 from src.config import settings
-from src.scraper.browser import browser_manager
+from src.scraper.browser import (
+    call_helper as _call_helper, dismiss_any_overlay, ensure_order_page, wait_for_function,
+    wait_for_network_idle, wait_for_selector,
+)
 
 logger = logging.getLogger(__name__)
 
+_ORDER_ID_RE = re.compile(r"getoneorder/(\d+)")
+_ASSISTANT = "ассистент"
 
-@dataclass
+
+@dataclass(slots=True)
 class ChatMessage:
-    """Сообщение из чата."""
+    """Сообщение из чата (__slots__: без __dict__ на каждое сообщение)."""
     order_id: str
     text: str
     is_incoming: bool  # True = от заказчика, False = от нас
     timestamp: Optional[str] = None
     is_system: bool = False  # "Вы сделали ставку", "Вас выбрали автором" и т.д.
     has_files: bool = False  # Есть ли прикреплённые файлы
-    file_urls: list = None  # URL файлов для скачивания
+    file_urls: list = field(default_factory=list)  # URL файлов для скачивания
     sender_name: Optional[str] = None  # Имя отправителя ("Ассистент", имя заказчика, etc.)
+    # Сообщение от платформенного Ассистента — вычисляется один раз в __post_init__
+    is_assistant: bool = field(default=False, init=False, compare=False)
 
     def __post_init__(self):
-        if self.file_urls is None:
-            self.file_urls = []
-
-    @property
-    def is_assistant(self) -> bool:
-        """Сообщение от платформенного Ассистента (изменение условий заказа).
-
-        На Автор24 изменения условий приходят как обычные сообщения
-        с текстом 'Заказчик изменил в заказе: ...' — без слова 'Ассистент'.
-        Также проверяем по имени отправителя на случай других форматов.
-        """
-        if self.sender_name and "ассистент" in self.sender_name.lower():
-            return True
-        if self.is_system and self.text and "ассистент" in self.text.lower():
-            return True
-        # Текстовые паттерны: реальный формат на Автор24
-        if self.text:
-            lower = self.text.lower()
-            if "заказчик изменил в заказе" in lower:
-                return True
-            if "заказчик изменил" in lower and "заказе" in lower:
-                return True
-            if "условия заказа" in lower and ("изменен" in lower or "изменён" in lower):
-                return True
-        return False
-
+        self.is_assistant = _is_assistant_message(self.text, self.sender_name, self.is_system)
 
-def _order_page_url(order_id: str) -> str:
-    """URL страницы заказа (где живёт чат)."""
-    return f"{settings.avtor24_base_url}/order/getoneorder/{order_id}"
 
+def _is_assistant_message(text: str, sender_name: Optional[str], is_system: bool) -> bool:
+    """Сообщение от платформенного Ассистента (изменение условий заказа).
 
-async def _ensure_order_page(page: Page, order_id: str) -> None:
-    """Убедиться что мы на странице нужного заказа."""
-    current = page.url
-    if f"/order/getoneorder/{order_id}" not in current:
-        await page.goto(_order_page_url(order_id),
-                        wait_until="domcontentloaded", timeout=30000)
-        await asyncio.sleep(5)
+    На Автор24 изменения условий приходят как обычные сообщения
+    с текстом 'Заказчик изменил в заказе: ...' — без слова 'Ассистент'.
+    Также проверяем по имени отправителя на случай других форматов.
+    """
+    if sender_name and _ASSISTANT in sender_name.lower():
+        return True
+    if not text:
+        return False
+    lower = text.lower()
+    if is_system and _ASSISTANT in lower:
+        return True
+    # Текстовые паттерны: реальный формат на Автор24
+    if "заказчик изменил в заказе" in lower:
+        return True
+    if "заказчик изменил" in lower and "заказе" in lower:
+        return True
+    if "условия заказа" in lower and ("изменен" in lower or "изменён" in lower):
+        return True
+    return False
+
+
+# Селекторы готовности React-контента (вместо слепых sleep)
+_MODAL = '[data-testid*="alertModal"], [class*="Modal"]'
+# /home: список заказов или хотя бы вкладки-фильтры (если заказов нет)
+_HOME_READY = 'a[href*="/order/getoneorder/"], .header-filter-item'
+# Кнопки действий заказа отрисованы (Подтвердить / Отменить / ...)
+_ORDER_BUTTONS_READY = '#root button'
+# Кнопка отправки активна (React снимает disabled, когда текст принят)
+_SEND_ENABLED = (
+    "(() => { const b = document.querySelector("
+    "'[data-testid=\"dialogMessageInput-action_sendMsg\"], [class*=\"SendAction\"]');"
+    " return !b || !b.disabled; })()"
+)
+
+# Каскады поиска кнопок для window.__a24.clickButton — попытки по приоритету,
+# весь каскад отрабатывает за один evaluate
+_CONFIRM_BUTTON = [{"scope": None, "labels": ["Подтвердить"]}]
+_CONFIRM_MODAL_BUTTON = [
+    {"scope": '[data-testid*="alertModal"]', "labels": ["Подтвердить"]},
+    {"scope": '[class*="Modal"]', "labels": ["Подтвердить", "Да"]},
+    {"scope": '[class*="Overlay"] ~ *, [class*="dialog"]', "labels": ["Подтвердить"]},
+    # Последняя попытка: вторая кнопка "Подтвердить" на странице
+    {"scope": None, "labels": ["Подтвердить"], "nth": 1},
+]
+_CANCEL_BUTTON = [{"scope": None, "labels": ["Отменить", "Отказаться"]}]
+_CANCEL_MODAL_BUTTON = [
+    {"scope": '[data-testid*="alertModal"], [class*="Modal"]', "labels": ["Подтвердить", "Да"]},
+    # Fallback: любая кнопка подтверждения
+    {"scope": None, "labels": ["Подтвердить", "Да"]},
+]
+# window.__a24.clickWithModal: основная кнопка не найдена
+_NO_BUTTON = -2
 
 
 async def _ensure_chat_tab(page: Page) -> None:
-    """Кликнуть на вкладку 'Чат с заказчиком' если не активна."""
+    """Кликнуть на вкладку 'Чат с заказчиком' если не активна.
+
+    Клик и ожидание сообщений/поля ввода — один evaluate. Если вкладка уже
+    открыта в текущем документе (get_messages перед send_message), хелпер
+    возвращается сразу, без клика.
+    """
     try:
-        chat_tab = page.locator('button:has-text("Чат с заказчиком")')
-        if await chat_tab.count() > 0:
-            await chat_tab.first.click()
-            await asyncio.sleep(1)
+        await _call_helper(page, "openChatTab", {"timeout": 5000, "needInput": True})
     except Exception:
         pass
 
@@ -91,201 +122,154 @@ async def get_order_page_info(page: Page, order_id: str) -> dict:
       - has_confirm_btn: bool (кнопка Подтвердить)
       - has_bid_form: bool
       - has_chat: bool
-      - messages: list[dict]
+      - messages: list[ChatMessage]
       - page_text: str
+
+    Сообщения кладутся в кэш истории — get_messages того же заказа
+    в пределах settings.chat_poll_ttl_s не делает второй evaluate.
     """
-    await _ensure_order_page(page, order_id)
-    await _ensure_chat_tab(page)
-    await asyncio.sleep(2)
-
-    return await page.evaluate("""
-        () => {
-            const fullText = document.body.innerText || '';
-
-            // Статус
-            const accepted = fullText.includes('Вас выбрали автором');
-            let confirmBtnFound = false;
-            document.querySelectorAll('button').forEach(btn => {
-                if ((btn.innerText || '').trim() === 'Подтвердить') confirmBtnFound = true;
-            });
-            const hasBidForm = !!document.querySelector('#MakeOffer__inputBid');
-            const hasChat = !!document.querySelector('textarea');
-
-            // Извлекаем сообщения из чата
-            const messages = [];
-            const groupItems = document.querySelectorAll('[class*="GroupItem"]');
-            groupItems.forEach(item => {
-                const text = (item.innerText || '').trim();
-                if (!text) return;
-
-                const isSystem = !!item.querySelector('[class*="MessageSystemStyled"]');
-                const msgBase = item.querySelector('[class*="MessageBaseStyled"]');
-                const hasAvatar = !!item.querySelector('[class*="MessageAvatar"]');
-                let isOutgoing = false;
-                if (msgBase && !isSystem) {
-                    isOutgoing = !hasAvatar;
-                }
-
-                let timestamp = '';
-                const timeEl = item.querySelector('[class*="Time"], time, [class*="timestamp"]');
-                if (timeEl) timestamp = (timeEl.innerText || '').trim();
-
-                messages.push({
-                    text: text.substring(0, 2000),
-                    isSystem,
-                    isOutgoing,
-                    timestamp,
-                });
-            });
-
-            return {
-                accepted,
-                hasConfirmBtn: confirmBtnFound,
-                hasBidForm,
-                hasChat,
-                messages,
-                pageText: fullText.substring(0, 3000),
-            };
-        }
-    """)
+    await ensure_order_page(page, order_id)
+
+    # Клик по вкладке чата, ожидание и извлечение — один evaluate (JSON-строка)
+    info = json.loads(await _call_helper(page, "extractOrderInfo"))
+    messages = _to_chat_messages(order_id, info["messages"])
+    _msg_cache[order_id] = (time.monotonic(), messages)
+    info["messages"] = list(messages)
+    return info
+
+
+# История чата по order_id: (time.monotonic() чтения, сообщения).
+# Повторные опросы одного заказа в пределах settings.chat_poll_ttl_s
+# не трогают страницу.
+_msg_cache: dict[str, tuple[float, list[ChatMessage]]] = {}
+
+
+def invalidate_messages_cache(order_id: str) -> None:
+    """Сбросить кэш истории чата заказа (после отправки/смены статуса)."""
+    _msg_cache.pop(order_id, None)
+
+
+# Флаги сообщения в столбце flags (MSG_SYSTEM / MSG_OUTGOING в chat_helpers.js)
+_MSG_SYSTEM = 1
+_MSG_OUTGOING = 2
+
+
+def _to_chat_messages(order_id: str, packed: dict) -> list[ChatMessage]:
+    """Сообщения из window.__a24 (collectMessages, «столбцами») → ChatMessage."""
+    files = packed["files"]
+    return [
+        ChatMessage(
+            order_id=order_id,
+            text=text,
+            # Системные сообщения — не входящие
+            is_incoming=not flags & (_MSG_SYSTEM | _MSG_OUTGOING),
+            timestamp=timestamp,
+            is_system=bool(flags & _MSG_SYSTEM),
+            has_files=str(i) in files,
+            file_urls=files.get(str(i), []),
+            sender_name=sender or None,
+        )
+        for i, (text, flags, timestamp, sender) in enumerate(zip(
+            packed["texts"], packed["flags"], packed["timestamps"], packed["senders"],
+        ))
+    ]
 
 
 async def get_messages(page: Page, order_id: str) -> list[ChatMessage]:
-    """Получить историю сообщений чата заказа."""
+    """Получить историю сообщений чата заказа.
+
+    В пределах settings.chat_poll_ttl_s возвращается ранее прочитанная история.
+    """
+    hit = _msg_cache.get(order_id)
+    if hit and time.monotonic() - hit[0] < settings.chat_poll_ttl_s:
+        return list(hit[1])
     try:
-        await _ensure_order_page(page, order_id)
-        await _ensure_chat_tab(page)
-        await asyncio.sleep(2)
-
-        raw = await page.evaluate("""
-            () => {
-                const messages = [];
-                const items = document.querySelectorAll('[class*="GroupItem"]');
-
-                items.forEach(item => {
-                    const text = (item.innerText || '').trim();
-                    if (!text) return;
-
-                    const isSystem = !!item.querySelector('[class*="MessageSystemStyled"]');
-
-                    // Извлекаем имя отправителя из заголовка группы
-                    let senderName = '';
-                    const group = item.closest('[class*="GroupStyled"], [class*="Group"]');
-                    if (group) {
-                        const nameEl = group.querySelector(
-                            '[class*="NameStyled"], [class*="Name"], [class*="AuthorName"], [class*="Sender"]'
-                        );
-                        if (nameEl) {
-                            senderName = (nameEl.textContent || '').trim();
-                        }
-                    }
-
-                    // Определяем направление (incoming vs outgoing)
-                    // На Avtor24: входящие сообщения имеют аватар (MessageAvatarStyled),
-                    // исходящие (наши) — нет.
-                    const msgBase = item.querySelector('[class*="MessageBaseStyled"]');
-                    const hasAvatar = !!item.querySelector('[class*="MessageAvatar"]');
-                    let isOutgoing = false;
-
-                    if (msgBase && !isSystem) {
-                        // Основной метод: аватар = входящее, нет аватара = исходящее
-                        isOutgoing = !hasAvatar;
-                    }
-
-                    let timestamp = '';
-                    const timeEl = item.querySelector('[class*="Time"]');
-                    if (timeEl) timestamp = (timeEl.innerText || '').trim();
-
-                    // Обнаружение прикреплённых файлов
-                    const fileUrls = [];
-                    const fileLinks = item.querySelectorAll(
-                        'a[href*="/download/"], a[href*="/file/"], a[href*="/attachment/"], ' +
-                        'a[href*="/ajax/"], a[download], ' +
-                        '[class*="FileStyled"] a, [class*="Attachment"] a, [class*="file"] a'
-                    );
-                    fileLinks.forEach(link => {
-                        const href = link.href || link.getAttribute('href');
-                        if (href) fileUrls.push(href);
-                    });
-                    const fileElements = item.querySelectorAll(
-                        '[class*="FileStyled"], [class*="AttachmentStyled"], [class*="FileMessage"]'
-                    );
-                    fileElements.forEach(el => {
-                        const link = el.querySelector('a');
-                        if (link) {
-                            const href = link.href || link.getAttribute('href');
-                            if (href && !fileUrls.includes(href)) fileUrls.push(href);
-                        }
-                    });
-
-                    messages.push({
-                        text: text.substring(0, 2000),
-                        isSystem,
-                        isOutgoing,
-                        timestamp,
-                        hasFiles: fileUrls.length > 0,
-                        fileUrls: fileUrls,
-                        senderName: senderName,
-                        hasAvatar: hasAvatar,
-                    });
-                });
-
-                return messages;
-            }
-        """)
-
-        result = []
-        for msg in raw:
-            file_urls = msg.get("fileUrls", [])
-            has_files = msg.get("hasFiles", False) or len(file_urls) > 0
-            sender_name = msg.get("senderName", "") or None
-            if msg.get("isSystem"):
-                result.append(ChatMessage(
-                    order_id=order_id,
-                    text=msg["text"],
-                    is_incoming=False,
-                    timestamp=msg.get("timestamp"),
-                    is_system=True,
-                    has_files=has_files,
-                    file_urls=file_urls,
-                    sender_name=sender_name,
-                ))
-            else:
-                result.append(ChatMessage(
-                    order_id=order_id,
-                    text=msg["text"],
-                    is_incoming=not msg.get("isOutgoing", False),
-                    timestamp=msg.get("timestamp"),
-                    has_files=has_files,
-                    file_urls=file_urls,
-                    sender_name=sender_name,
-                ))
-
-        return result
+        await ensure_order_page(page, order_id)
+
+        # Клик по вкладке чата, ожидание и извлечение — один evaluate (JSON-строка)
+        packed = json.loads(await _call_helper(page, "extractMessages"))
+        messages = _to_chat_messages(order_id, packed)
+        _msg_cache[order_id] = (time.monotonic(), messages)
+        return list(messages)
 
     except Exception as e:
         logger.error("Ошибка получения сообщений для заказа %s: %s", order_id, e)
         return []
 
 
+# Время последней успешной навигации на /home по id(page) (time.monotonic()).
+# Опросы /home в одном цикле планировщика идут подряд — повторный goto
+# в пределах TTL не нужен.
+_HOME_NAV_TTL = 10.0
+_home_nav_cache: dict[int, float] = {}
+
+
+def _home_cached(page: Page) -> bool:
+    """Страница уже на /home и навигация была не раньше _HOME_NAV_TTL назад."""
+    last = _home_nav_cache.get(id(page), 0.0)
+    return time.monotonic() - last < _HOME_NAV_TTL and "/home" in page.url
+
+
+def invalidate_home_cache(page: Page) -> None:
+    """Сбросить кэш навигации на /home для страницы (после её изменения/закрытия)."""
+    _home_nav_cache.pop(id(page), None)
+    _active_ids_cache.pop(id(page), None)
+
+
+# Навигация на /home, которая выполняется прямо сейчас, по id(page):
+# параллельные вызовы на одной странице ждут её, а не делают свой goto.
+_home_nav_inflight: dict[int, asyncio.Task] = {}
+
+
 async def _navigate_home(page: Page) -> bool:
     """Перейти на /home и дождаться загрузки.
 
+    Если страница уже открыта на /home не раньше _HOME_NAV_TTL секунд
+    назад — навигация пропускается. Одновременные вызовы на одной странице
+    разделяют одну навигацию.
+
     Returns True если страница загрузилась, False при ошибке/redirect на login.
     """
+    if _home_cached(page):
+        return True
+    key = id(page)
+    task = _home_nav_inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(_do_navigate_home(page))
+        _home_nav_inflight[key] = task
+        task.add_done_callback(
+            lambda t: _home_nav_inflight.pop(key, None) if _home_nav_inflight.get(key) is t else None
+        )
+    # shield: отмена одного из ожидающих не прерывает общую навигацию
+    return await asyncio.shield(task)
+
+
+async def _do_navigate_home(page: Page) -> bool:
+    """goto /home и ожидание разметки (см. _navigate_home)."""
     home_url = f"{settings.avtor24_base_url}/home"
     try:
-        await page.goto(home_url, wait_until="domcontentloaded", timeout=30000)
+        await page.goto(home_url, wait_until="commit", timeout=30000)
     except Exception as nav_err:
         if "ERR_ABORTED" in str(nav_err):
             logger.debug("ERR_ABORTED на /home, ждём загрузки страницы...")
-            await asyncio.sleep(5)
+            # Либо редирект на логин, либо отрисовка /home
+            await wait_for_function(
+                page,
+                "location.pathname.startsWith('/login') || "
+                f"!!document.querySelector({json.dumps(_HOME_READY)})",
+                timeout=10000,
+            )
             if "/login" in page.url:
                 logger.warning("Сессия истекла, требуется повторный логин")
                 return False
         else:
             raise
-    await asyncio.sleep(5)
+    # Список заказов приходит XHR после монтирования SPA: ждём разметку
+    # и окончание запросов вместо фиксированной паузы
+    await wait_for_selector(page, _HOME_READY, timeout=10000)
+    # networkidle сам по себе означает 500 мс без запросов — доп. пауза не нужна
+    await wait_for_network_idle(page, timeout=5000)
+    _home_nav_cache[id(page)] = time.monotonic()
     return True
 
 
@@ -295,22 +279,11 @@ async def _click_home_tab(page: Page, tab_text: str) -> bool:
     Вкладки реализованы как <span class="header-filter-item"> внутри <li>.
     Клик по родительскому <li> переключает вид.
     """
-    clicked = await page.evaluate("""
-        (tabText) => {
-            const spans = document.querySelectorAll('.header-filter-item, span');
-            for (const span of spans) {
-                const text = (span.textContent || '').trim();
-                if (text === tabText || text.includes(tabText)) {
-                    const target = span.closest('li') || span;
-                    target.click();
-                    return true;
-                }
-            }
-            return false;
-        }
-    """, tab_text)
+    clicked = await _call_helper(page, "clickHomeTab", tab_text)
     if clicked:
-        await asyncio.sleep(3)  # ждём обновления React-контента
+        # Список перерисовывается после XHR без надёжного признака готовности
+        # (networkidle уже достигнут до клика) — пауза остаётся
+        await asyncio.sleep(3)
     else:
         logger.warning("Вкладка '%s' не найдена на /home", tab_text)
     return clicked
@@ -323,39 +296,60 @@ async def _extract_visible_order_ids(page: Page) -> list[str]:
     Исключаем рекомендованные заказы (with ?from_recommended= в URL).
     Исключаем завершённые/отменённые заказы (по бейджу OrderStageLabel).
     """
-    raw: list[str] = await page.evaluate(r"""
-        () => {
-            const results = [];
-            const seen = new Set();
-            const skipStatuses = ['завершен', 'завершён', 'отменен', 'отменён'];
-            document.querySelectorAll('a[href*="/order/getoneorder/"]').forEach(a => {
-                if (a.href.includes('from_recommended')) return;
-                const match = a.href.match(/getoneorder\/(\d+)/);
-                if (!match || seen.has(match[1])) return;
-                seen.add(match[1]);
-
-                // Check for status badge on the order card
-                const card = a.closest('li, article, [class*="Card"], [class*="Item"], [class*="Chat"]');
-                const container = card || a.parentElement;
-                if (container) {
-                    let skip = false;
-                    container.querySelectorAll(
-                        '[class*="OrderStageLabel"], [class*="StageLabel"], [class*="Badge"], [class*="Status"]'
-                    ).forEach(badge => {
-                        const text = (badge.textContent || '').trim().toLowerCase();
-                        if (skipStatuses.some(s => text.includes(s))) {
-                            skip = true;
-                        }
-                    });
-                    if (skip) return;
-                }
-
-                results.push(match[1]);
-            });
-            return results;
-        }
-    """)
-    return raw
+    raw: str = await _call_helper(page, "extractOrderHrefs")
+    # dict.fromkeys — дедупликация с сохранением порядка
+    return list(dict.fromkeys(
+        m.group(1) for href in (raw.split("\n") if raw else ())
+        if (m := _ORDER_ID_RE.search(href))
+    ))
+
+
+# Вкладки /home: «Активные чаты» открыта по умолчанию
+_DEFAULT_HOME_TAB = "Активные чаты"
+
+
+async def _fetch_tab(page: Page, tab_text: Optional[str] = None) -> Optional[list[str]]:
+    """Перейти на /home, переключить вкладку и собрать order_id.
+
+    tab_text=None — остаёмся на дефолтной вкладке без клика. Если /home
+    взят из кэша навигации, на странице может быть открыта другая вкладка —
+    тогда дефолтная кликается явно.
+    Returns None при редиректе на логин или если вкладка не найдена
+    (для дефолтной вкладки отсутствие кнопки не считается ошибкой).
+    """
+    if tab_text is None and _home_cached(page):
+        tab_text = _DEFAULT_HOME_TAB
+    if not await _navigate_home(page):
+        return None
+    if tab_text:
+        clicked = await _click_home_tab(page, tab_text)
+        if not clicked and tab_text != _DEFAULT_HOME_TAB:
+            return None
+    return await _extract_visible_order_ids(page)
+
+
+# Результат вкладки «Активные чаты» по id(page): (time.monotonic(), order_ids).
+# get_accepted_order_ids и get_active_chats читают одну и ту же вкладку —
+# второй вызов в пределах TTL не ходит на /home.
+_ACTIVE_IDS_TTL = 10.0
+_active_ids_cache: dict[int, tuple[float, list[str]]] = {}
+
+
+async def _fetch_active_ids(page: Page) -> Optional[list[str]]:
+    """order_id из вкладки «Активные чаты» с кэшем на _ACTIVE_IDS_TTL секунд.
+
+    Returns None при редиректе на логин (не кэшируется).
+    """
+    hit = _active_ids_cache.get(id(page))
+    if hit and time.monotonic() - hit[0] < _ACTIVE_IDS_TTL:
+        return list(hit[1])
+    # «Активные чаты» — дефолтная вкладка: после свежей навигации кликать
+    # не нужно, при кэшированном /home _fetch_tab кликнет её сам
+    active_ids = await _fetch_tab(page)
+    if active_ids is not None:
+        _active_ids_cache[id(page)] = (time.monotonic(), active_ids)
+        return list(active_ids)
+    return None
 
 
 async def get_accepted_order_ids(page: Page) -> list[str]:
@@ -368,12 +362,10 @@ async def get_accepted_order_ids(page: Page) -> list[str]:
     все заказы где мы назначены автором (в работе / доставлены).
     """
     try:
-        if not await _navigate_home(page):
+        active_ids = await _fetch_active_ids(page)
+        if active_ids is None:
             return []
 
-        # «Активные чаты» — дефолтная вкладка, кликать не нужно
-        active_ids = await _extract_visible_order_ids(page)
-
         if active_ids:
             logger.info(
                 "Найдено %d заказов в «Активные чаты» на /home",
@@ -393,15 +385,11 @@ async def get_waiting_confirmation_order_ids(page: Page) -> list[str]:
     Эти заказы требуют нажатия кнопки «Подтвердить» на странице заказа.
     """
     try:
-        if not await _navigate_home(page):
-            return []
-
-        if not await _click_home_tab(page, "Ждут подтверждения"):
-            logger.warning("Не удалось переключить на вкладку «Ждут подтверждения»")
+        waiting_ids = await _fetch_tab(page, "Ждут подтверждения")
+        if waiting_ids is None:
+            logger.warning("Не удалось открыть вкладку «Ждут подтверждения»")
             return []
 
-        waiting_ids = await _extract_visible_order_ids(page)
-
         if waiting_ids:
             logger.info(
                 "Найдено %d заказов «Ждут подтверждения» на /home",
@@ -417,19 +405,15 @@ async def get_waiting_confirmation_order_ids(page: Page) -> list[str]:
 async def get_active_chats(page: Page) -> list[str]:
     """Получить список order_id с активными чатами (в работе).
 
-    Кликает вкладку «Активные чаты» (дефолтная) и извлекает order_id.
+    Читает вкладку «Активные чаты» (дефолтная) и извлекает order_id —
+    результат общий с get_accepted_order_ids (см. _fetch_active_ids).
     Показывает заказы где мы назначены автором и работа активна.
     """
     try:
-        if not await _navigate_home(page):
+        active_ids = await _fetch_active_ids(page)
+        if active_ids is None:
             return []
 
-        # «Активные чаты» — дефолтная вкладка, но кликнем на всякий случай
-        # (если до этого переключались на другую вкладку)
-        await _click_home_tab(page, "Активные чаты")
-
-        active_ids = await _extract_visible_order_ids(page)
-
         logger.info(
             "Найдено %d активных чатов на /home",
             len(active_ids),
@@ -441,48 +425,70 @@ async def get_active_chats(page: Page) -> list[str]:
         return []
 
 
+# Заказы, в которые за эту сессию уже отправлено сообщение с имитацией набора
+_typed_orders: set[str] = set()
+
+
+def _should_type(order_id: str) -> bool:
+    """Печатать ли сообщение с имитацией набора (иначе — вставка одним evaluate)."""
+    if settings.typing_delay_ms <= 0:
+        return False
+    return not (settings.typing_first_message_only and order_id in _typed_orders)
+
+
 async def send_message(page: Page, order_id: str, text: str) -> bool:
     """Отправить сообщение в чат заказа.
 
     Использует textarea на странице /order/getoneorder/{order_id}.
-    Печатает текст с имитацией набора (type вместо fill) для естественности.
+    Печатает текст с имитацией набора (type вместо fill) для естественности;
+    при settings.typing_delay_ms == 0, а при typing_first_message_only — для
+    всех сообщений заказа после первого, текст вставляется и отправляется
+    одним evaluate.
     """
     try:
-        await _ensure_order_page(page, order_id)
+        await ensure_order_page(page, order_id)
         await _ensure_chat_tab(page)
-        await asyncio.sleep(1)
 
-        # Поле ввода: textarea с placeholder "Ваш ответ"
-        msg_input = page.locator('textarea')
-        if await msg_input.count() == 0:
+        if not _should_type(order_id):
+            status = await _call_helper(page, "fillAndSend", text)
+            if status < 0:
+                logger.error("Не найден textarea для заказа %s", order_id)
+                return False
+            if status == 0:
+                # Fallback: Ctrl+Enter
+                await page.locator('textarea').first.press("Control+Enter")
+            await wait_for_function(
+                page, "document.querySelector('textarea').value === ''", timeout=5000,
+            )
+            invalidate_messages_cache(order_id)
+            logger.info("Сообщение отправлено в чат заказа %s", order_id)
+            return True
+
+        # Поле ввода: textarea с placeholder "Ваш ответ" (поиск, фокус и
+        # очистка — один evaluate)
+        if not await _call_helper(page, "focusTextarea"):
             logger.error("Не найден textarea для заказа %s", order_id)
             return False
-
-        await msg_input.first.click()
-        await asyncio.sleep(0.5)
+        msg_input = page.locator('textarea')
 
         # Имитация набора текста (type с задержкой между символами)
-        await msg_input.first.fill("")  # очистить
-        await msg_input.first.type(text, delay=30)  # ~30мс между символами
-        await asyncio.sleep(1)
+        await msg_input.first.type(text, delay=settings.typing_delay_ms)
+        await wait_for_function(page, _SEND_ENABLED, timeout=3000)
 
         # Отправка через JS (кнопка может быть скрыта Playwright'ом)
-        sent = await page.evaluate("""
-            () => {
-                let btn = document.querySelector('[data-testid="dialogMessageInput-action_sendMsg"]');
-                if (btn) { btn.click(); return true; }
-                btn = document.querySelector('[class*="SendAction"]');
-                if (btn) { btn.click(); return true; }
-                return false;
-            }
-        """)
+        sent = await _call_helper(page, "sendMessage")
 
         if not sent:
             # Fallback: Ctrl+Enter
             await msg_input.first.press("Control+Enter")
 
-        await asyncio.sleep(2)
+        # После отправки React очищает textarea — это и есть сигнал готовности
+        await wait_for_function(
+            page, "document.querySelector('textarea').value === ''", timeout=5000,
+        )
 
+        _typed_orders.add(order_id)
+        invalidate_messages_cache(order_id)
         logger.info("Сообщение отправлено в чат заказа %s", order_id)
         return True
 
@@ -499,47 +505,31 @@ async def confirm_order(page: Page, order_id: str) -> bool:
     нужно нажать подтверждение и в модалке тоже.
     """
     try:
-        await _ensure_order_page(page, order_id)
-        await asyncio.sleep(2)
-
-        # Ищем кнопку "Подтвердить" на странице
-        confirm_btn = page.locator('button:has-text("Подтвердить")')
-        if await confirm_btn.count() == 0:
+        await ensure_order_page(page, order_id)
+        await wait_for_selector(page, _ORDER_BUTTONS_READY, timeout=5000)
+
+        # Кнопка "Подтвердить" на странице, затем модальное окно подтверждения:
+        # alertModal → любая модалка/оверлей → вторая кнопка на странице.
+        # Клик, ожидание модалки и клик в ней — один evaluate
+        step = await _call_helper(page, "clickWithModal", {
+            "button": _CONFIRM_BUTTON,
+            "modalSteps": _CONFIRM_MODAL_BUTTON,
+            "modalSelector": _MODAL,
+        })
+        if step == _NO_BUTTON:
             logger.warning("Кнопка 'Подтвердить' не найдена для заказа %s", order_id)
             return False
-
-        await confirm_btn.first.click()
-        await asyncio.sleep(2)
-
-        # После клика появляется модальное окно подтверждения
-        # Ищем кнопку подтверждения в модалке (data-testid="alertModal")
-        modal_confirm = page.locator('[data-testid*="alertModal"] button:has-text("Подтвердить")')
-        if await modal_confirm.count() > 0:
-            await modal_confirm.first.click()
+        if step == 0:
             logger.info("Нажата кнопка подтверждения в модалке для заказа %s", order_id)
-            await asyncio.sleep(3)
-        else:
-            # Попробуем найти любую кнопку "Подтвердить" / "Да" в оверлее
-            modal_yes = page.locator(
-                '[class*="Modal"] button:has-text("Подтвердить"), '
-                '[class*="Modal"] button:has-text("Да"), '
-                '[class*="Overlay"] ~ * button:has-text("Подтвердить"), '
-                '[class*="dialog"] button:has-text("Подтвердить")'
-            )
-            if await modal_yes.count() > 0:
-                await modal_yes.first.click()
-                await asyncio.sleep(3)
-            else:
-                # Последняя попытка: вторая кнопка "Подтвердить" на странице
-                all_confirm = page.locator('button:has-text("Подтвердить")')
-                count = await all_confirm.count()
-                if count > 1:
-                    await all_confirm.nth(1).click()
-                    await asyncio.sleep(3)
+        if step >= 0:
+            await wait_for_selector(page, _MODAL, state="hidden", timeout=5000)
 
         # Убедимся что модалка закрылась
-        await _dismiss_any_overlay(page)
+        await dismiss_any_overlay(page)
 
+        invalidate_messages_cache(order_id)
+        # Заказ сменил вкладку на /home — кэш «Активных чатов» устарел
+        invalidate_home_cache(page)
         logger.info("Заказ %s подтверждён (нажата 'Подтвердить')", order_id)
         return True
 
@@ -548,18 +538,6 @@ async def confirm_order(page: Page, order_id: str) -> bool:
         return False
 
 
-async def _dismiss_any_overlay(page: Page) -> None:
-    """Закрыть модальные окна/оверлеи если есть."""
-    try:
-        overlay = page.locator('[class*="Overlay"]')
-        if await overlay.count() > 0:
-            # Попробуем нажать Escape
-            await page.keyboard.press("Escape")
-            await asyncio.sleep(1)
-    except Exception:
-        pass
-
-
 async def cancel_order(page: Page, order_id: str) -> bool:
     """Отменить заказ — нажать кнопку «Отменить» на странице заказа.
 
@@ -569,44 +547,30 @@ async def cancel_order(page: Page, order_id: str) -> bool:
     Returns True если отмена прошла успешно.
     """
     try:
-        await _ensure_order_page(page, order_id)
-        await asyncio.sleep(2)
-
-        # Ищем кнопку "Отменить" / "Отказаться от заказа"
-        cancel_btn = page.locator(
-            'button:has-text("Отменить"), '
-            'button:has-text("Отказаться"), '
-            'button:has-text("Отказаться от заказа")'
-        )
-        if await cancel_btn.count() == 0:
+        await ensure_order_page(page, order_id)
+        await wait_for_selector(page, _ORDER_BUTTONS_READY, timeout=5000)
+
+        # Кнопка "Отменить" / "Отказаться от заказа", затем подтверждение
+        # в модальном окне (fallback — любая кнопка подтверждения) — один
+        # evaluate. JS-клик не блокируется оверлеями (аналог force=True)
+        step = await _call_helper(page, "clickWithModal", {
+            "button": _CANCEL_BUTTON,
+            "modalSteps": _CANCEL_MODAL_BUTTON,
+            "modalSelector": _MODAL,
+        })
+        if step == _NO_BUTTON:
             logger.warning("Кнопка 'Отменить' не найдена для заказа %s", order_id)
             return False
-
-        # Используем force=True — оверлеи могут блокировать клик
-        await cancel_btn.first.click(force=True)
-        await asyncio.sleep(2)
-
-        # Подтверждение в модальном окне
-        modal_confirm = page.locator(
-            '[data-testid*="alertModal"] button:has-text("Подтвердить"), '
-            '[data-testid*="alertModal"] button:has-text("Да"), '
-            '[class*="Modal"] button:has-text("Подтвердить"), '
-            '[class*="Modal"] button:has-text("Да")'
-        )
-        if await modal_confirm.count() > 0:
-            await modal_confirm.first.click(force=True)
+        if step == 0:
             logger.info("Подтверждена отмена заказа %s в модалке", order_id)
-            await asyncio.sleep(3)
-        else:
-            # Fallback: ищем любую кнопку подтверждения
-            any_confirm = page.locator('button:has-text("Подтвердить"), button:has-text("Да")')
-            count = await any_confirm.count()
-            if count > 0:
-                await any_confirm.first.click(force=True)
-                await asyncio.sleep(3)
+        if step >= 0:
+            await wait_for_selector(page, _MODAL, state="hidden", timeout=5000)
 
-        await _dismiss_any_overlay(page)
+        await dismiss_any_overlay(page)
 
+        invalidate_messages_cache(order_id)
+        # Заказ сменил вкладку на /home — кэш «Активных чатов» устарел
+        invalidate_home_cache(page)
         logger.info("Заказ %s отменён (нажата 'Отменить')", order_id)
         return True
 
@@ -618,23 +582,24 @@ async def cancel_order(page: Page, order_id: str) -> bool:
 async def download_chat_files(page: Page, order_id: str, file_urls: list[str]) -> list[str]:
     """Скачать файлы из чата (прикреплённые заказчиком).
 
+    Несколько файлов качаются параллельно (см. file_handler.download_files).
+
     Returns:
         Список путей к скачанным файлам.
     """
-    from src.scraper.file_handler import download_files
-
     if not file_urls:
         return []
 
+    from src.scraper.file_handler import download_files
+
     try:
         downloaded = await download_files(page, order_id, file_urls)
-        paths = [str(p) for p in downloaded]
-        if paths:
+        if downloaded:
             logger.info(
                 "Скачано %d файлов из чата заказа %s",
-                len(paths), order_id,
+                len(downloaded), order_id,
             )
-        return paths
+        return [str(p) for p in downloaded]
     except Exception as e:
         logger.warning("Ошибка скачивания файлов из чата %s: %s", order_id, e)
         return []
@@ -656,7 +621,9 @@ async def send_file_with_message(
     if not file_ok:
         return False
 
-    # Отправляем сопроводительное сообщение отдельно
-    await asyncio.sleep(2)
+    # Отправляем сопроводительное сообщение отдельно. upload_file оставляет
+    # страницу на заказе, так что send_message не навигирует — достаточно
+    # дождаться закрытия модалки загрузки
+    await dismiss_any_overlay(page)
     msg_ok = await send_message(page, order_id, message)
     return msg_ok
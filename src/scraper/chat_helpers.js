@@ -0,0 +1,651 @@
+// JS-хелперы Автор24 (чат, /home, лента заказов) — регистрируются один раз на контекст через
+// context.add_init_script(). Python вызывает их короткими выражениями
+// вида page.evaluate("(arg) => window.__a24.extractMessages(arg)"),
+// поэтому V8 парсит этот код один раз, а не на каждый evaluate.
+// Крупные результаты возвращаются строкой (JSON / через запятую): одна
+// строка по CDP передаётся намного быстрее, чем граф объектов через
+// структурный сериализатор Playwright.
+(() => {
+    if (window.__a24) return;
+
+    // [class*="X"] → getElementsByClassName по реальному имени класса.
+    // styled-components дают классы вида "GroupItemStyled-sc-1x2y3z": имя
+    // определяется по первому совпадению и кэшируется, если у всех найденных
+    // элементов это один и тот же класс. Дальше — поиск по классу без
+    // сканирования атрибутов; пустой результат (ре-рендер с другим хэшем)
+    // сбрасывает кэш.
+    const classTokens = new Map();
+    function byClassPart(part) {
+        const token = classTokens.get(part);
+        if (token) {
+            const live = document.getElementsByClassName(token);
+            if (live.length) return live;
+            classTokens.delete(part);
+        }
+        const found = document.querySelectorAll(`[class*="${part}"]`);
+        const tokens = new Set();
+        found.forEach(el => el.classList.forEach(c => { if (c.includes(part)) tokens.add(c); }));
+        if (tokens.size === 1) classTokens.set(part, [...tokens][0]);
+        return found;
+    }
+
+    // Дождаться check() через MutationObserver (без опроса), максимум timeout мс.
+    // Возвращает true, если условие выполнилось.
+    function waitFor(check, timeout, {attributes = false} = {}) {
+        if (check()) return Promise.resolve(true);
+        return new Promise(resolve => {
+            const observer = new MutationObserver(() => {
+                if (check()) {
+                    clearTimeout(timer);
+                    observer.disconnect();
+                    resolve(true);
+                }
+            });
+            const timer = setTimeout(() => { observer.disconnect(); resolve(false); }, timeout);
+            // documentElement, а не body: сразу после commit навигации body
+            // может ещё не быть
+            // attributes — когда готовность означает смену видимости уже
+            // существующего узла (class/style/hidden), а не появление нового
+            observer.observe(document.documentElement, attributes
+                ? {childList: true, subtree: true, attributes: true,
+                   attributeFilter: ['class', 'style', 'hidden', 'aria-hidden']}
+                : {childList: true, subtree: true});
+        });
+    }
+
+    // Путь заказа, на котором вкладка чата уже открыта. Живёт в документе,
+    // поэтому сбрасывается при любой навигации (init-скрипт выполняется заново).
+    let chatTabPath = null;
+
+    // Открыть вкладку «Чат с заказчиком» и дождаться сообщений (needInput —
+    // или поля ввода, для пустого чата). Повторный вызов на том же заказе
+    // без навигации не кликает вкладку снова. Возвращает true, если чат готов.
+    async function openChatTab({timeout = 2000, needInput = false} = {}) {
+        const ready = () => byClassPart('GroupItem').length > 0
+            || (needInput && !!document.querySelector('textarea'));
+        if (chatTabPath === location.pathname && ready()) return true;
+        const chatTab = [...document.querySelectorAll('button')]
+            .find(b => (b.textContent || '').includes('Чат с заказчиком'));
+        if (chatTab) chatTab.click();
+        const ok = await waitFor(ready, timeout);
+        if (ok) chatTabPath = location.pathname;
+        return ok;
+    }
+
+    // Статус заказа + сообщения чата (get_order_page_info). Сообщения
+    // собираются тем же collectMessages, что и в extractMessages, — Python
+    // кладёт их в кэш истории, и следующий get_messages не трогает DOM.
+    async function extractOrderInfo() {
+        await openChatTab();
+
+        // Статус: XPath останавливается на первом совпадении — без
+        // document.body.innerText (пересчёт layout + текст всей страницы).
+        // Проверяется полный текст (.) родителей текстовых узлов, а не только
+        // первый text(): фраза может идти после <b> и т.п. Элементы со
+        // script/style внутри пропускаются — их текст, как и в innerText,
+        // не считается
+        const accepted = !!document.evaluate(
+            '//text()[not(parent::script or parent::style or parent::noscript)]/parent::*'
+                + '[not(.//script or .//style)]'
+                + '[contains(normalize-space(.), "Вас выбрали автором")]',
+            document.body, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null,
+        ).singleNodeValue;
+        let confirmBtnFound = false;
+        document.querySelectorAll('button').forEach(btn => {
+            if ((btn.textContent || '').trim() === 'Подтвердить') confirmBtnFound = true;
+        });
+        const hasBidForm = !!document.querySelector('#MakeOffer__inputBid');
+        const hasChat = !!document.querySelector('textarea');
+
+        return JSON.stringify({
+            accepted,
+            hasConfirmBtn: confirmBtnFound,
+            hasBidForm,
+            hasChat,
+            messages: collectMessages(),
+            pageText: textPrefix(document.body, 3000),
+        });
+    }
+
+    // Непустые текстовые узлы элемента построчно — замена
+    // innerText.split('\n') без пересчёта layout.
+    function textLines(root) {
+        const lines = [];
+        const walker = document.createTreeWalker(root, NodeFilter.SHOW_TEXT);
+        let node;
+        while ((node = walker.nextNode())) {
+            const text = node.nodeValue.trim();
+            if (text) lines.push(text);
+        }
+        return lines;
+    }
+
+    // Первые limit символов текста элемента: обход текстовых узлов
+    // прекращается, как только набрано нужное, и не трогает layout.
+    function textPrefix(root, limit) {
+        const walker = document.createTreeWalker(root, NodeFilter.SHOW_TEXT, {
+            acceptNode: n => (n.parentElement && /^(SCRIPT|STYLE|NOSCRIPT)$/.test(n.parentElement.tagName))
+                ? NodeFilter.FILTER_REJECT : NodeFilter.FILTER_ACCEPT,
+        });
+        const parts = [];
+        let length = 0;
+        let node;
+        while (length < limit && (node = walker.nextNode())) {
+            const text = node.nodeValue.trim();
+            if (!text) continue;
+            parts.push(text);
+            length += text.length + 1;
+        }
+        return parts.join('\n').substring(0, limit);
+    }
+
+    // Ссылки на файлы внутри сообщения (проверяются через matches() только у <a>).
+    const FILE_LINK_SELECTOR =
+        'a[href*="/download/"], a[href*="/file/"], a[href*="/attachment/"], ' +
+        'a[href*="/ajax/"], a[download], ' +
+        '[class*="FileStyled"] a, [class*="Attachment"] a, [class*="file"] a';
+
+    // Все маркеры классов, которые разбирает scanMessage: один test()
+    // отсеивает узлы без признаков вместо девяти includes() на каждый
+    const MESSAGE_MARKER_RE =
+        /MessageSystemStyled|MessageBaseStyled|MessageAvatar|Time|timestamp|Name|Sender|FileStyled|AttachmentStyled|FileMessage/;
+
+    // Один проход TreeWalker по сообщению вместо отдельного
+    // querySelector/querySelectorAll на каждый признак.
+    function scanMessage(item) {
+        const seenUrls = new Set();
+        const info = {
+            isSystem: false,
+            msgBase: null,
+            hasAvatar: false,
+            timeEl: null,
+            nameEl: null,
+            fileUrls: [],
+            fileElements: [],
+            // Дедупликация URL через Set (O(1) вместо includes)
+            addFileUrl(href) {
+                if (href && !seenUrls.has(href)) {
+                    seenUrls.add(href);
+                    info.fileUrls.push(href);
+                }
+            },
+        };
+        const walker = document.createTreeWalker(item, NodeFilter.SHOW_ELEMENT);
+        let node;
+        while ((node = walker.nextNode())) {
+            const cls = node.getAttribute('class') || '';
+            if (cls && MESSAGE_MARKER_RE.test(cls)) {
+                if (cls.includes('MessageSystemStyled')) info.isSystem = true;
+                if (!info.msgBase && cls.includes('MessageBaseStyled')) info.msgBase = node;
+                if (cls.includes('MessageAvatar')) info.hasAvatar = true;
+                // Время: первый из [class*="Time"], <time>, [class*="timestamp"]
+                // в порядке документа (как querySelector со списком селекторов)
+                if (!info.timeEl && (cls.includes('Time') || cls.includes('timestamp'))) {
+                    info.timeEl = node;
+                }
+                // NameStyled / Name / AuthorName / Sender
+                if (!info.nameEl && (cls.includes('Name') || cls.includes('Sender'))) {
+                    info.nameEl = node;
+                }
+                if (cls.includes('FileStyled') || cls.includes('AttachmentStyled')
+                        || cls.includes('FileMessage')) {
+                    info.fileElements.push(node);
+                }
+            }
+            if (!info.timeEl && node.tagName === 'TIME') info.timeEl = node;
+            if (node.tagName === 'A' && node.matches(FILE_LINK_SELECTOR)) {
+                info.addFileUrl(node.href || node.getAttribute('href'));
+            }
+        }
+        return info;
+    }
+
+    // Флаги сообщения в столбце flags
+    const MSG_SYSTEM = 1;
+    const MSG_OUTGOING = 2;
+
+    // Сообщения открытого чата (общая часть extractMessages/extractOrderInfo)
+    // «столбцами»: имена полей не повторяются в JSON на каждое сообщение.
+    // flags — MSG_SYSTEM | MSG_OUTGOING, files — только у сообщений с
+    // вложениями: {индекс: [url, ...]}.
+    function collectMessages() {
+        const packed = {texts: [], flags: [], timestamps: [], senders: [], files: {}};
+        for (const item of byClassPart('GroupItem')) {
+            // innerText намеренно: переносы строк в тексте сообщения значимы
+            const text = (item.innerText || '').trim();
+            if (!text) continue;
+
+            const scan = scanMessage(item);
+            const {isSystem, msgBase, hasAvatar, timeEl, nameEl, fileUrls, fileElements} = scan;
+
+            // Имя отправителя. Прежний item.closest('[class*="Group"]') всегда
+            // возвращал сам GroupItem, поэтому имя ищется внутри сообщения —
+            // тем же проходом TreeWalker.
+            const senderName = nameEl ? (nameEl.textContent || '').trim() : '';
+
+            // Определяем направление (incoming vs outgoing)
+            // На Avtor24: входящие сообщения имеют аватар (MessageAvatarStyled),
+            // исходящие (наши) — нет. Только по классам: getComputedStyle
+            // в цикле форсировал бы пересчёт стилей на каждое сообщение.
+            let isOutgoing = false;
+            if (msgBase && !isSystem) {
+                // Основной метод: аватар = входящее, нет аватара = исходящее
+                isOutgoing = !hasAvatar;
+            }
+
+            const timestamp = timeEl ? (timeEl.textContent || '').trim() : '';
+
+            // Обнаружение прикреплённых файлов: ссылки собраны проходом выше,
+            // из контейнеров файлов берём первую ссылку
+            fileElements.forEach(el => {
+                const link = el.querySelector('a');
+                if (link) scan.addFileUrl(link.href || link.getAttribute('href'));
+            });
+
+            if (fileUrls.length) packed.files[packed.texts.length] = fileUrls;
+            packed.texts.push(text.substring(0, 2000));
+            packed.flags.push((isSystem ? MSG_SYSTEM : 0) | (isOutgoing ? MSG_OUTGOING : 0));
+            packed.timestamps.push(timestamp);
+            packed.senders.push(senderName);
+        }
+        return packed;
+    }
+
+    // Полная история сообщений чата (get_messages).
+    async function extractMessages() {
+        await openChatTab();
+        return JSON.stringify(collectMessages());
+    }
+
+    // Клик по вкладке на /home (Активные чаты / В работе / Ждут подтверждения).
+    // Вкладки — <span class="header-filter-item"> внутри <li>.
+    function clickHomeTab(tabText) {
+        const matches = el => (el.textContent || '').includes(tabText);
+        // Быстрый путь — только вкладки-фильтры; перебор всех <span>
+        // страницы — запасной вариант, если разметка вкладок изменится
+        const find = Array.prototype.find;
+        const tab = find.call(document.getElementsByClassName('header-filter-item'), matches)
+            || find.call(document.getElementsByTagName('span'), matches);
+        if (!tab) return false;
+        (tab.closest('li') || tab).click();
+        return true;
+    }
+
+    // Карточки ленты заказов /order/search (orders.parse_order_cards).
+    // root — документ (по умолчанию текущий) или разобранный parseOrderCards.
+    function extractOrderCards(root) {
+        return JSON.stringify(orderCards(root));
+    }
+
+    // Длина превью описания в карточке ленты
+    const DESCRIPTION_PREVIEW_LEN = 500;
+
+    function orderCards(root) {
+        let cards = (root || document).querySelectorAll('.auctionOrder');
+        return Array.from(cards).map(card => {
+            let orderId = card.getAttribute('data-id') || '';
+
+            // Заголовок
+            let titleEl = card.querySelector('[class*="TitleLinkStyled"] span');
+            let title = titleEl ? titleEl.textContent.trim() : '';
+
+            // URL
+            let linkEl = card.querySelector('a[href*="/order/getoneorder/"]');
+            let url = linkEl ? linkEl.getAttribute('href') : '';
+
+            // Информационные поля (.order-info-text)
+            let infoTexts = Array.from(card.querySelectorAll('.order-info-text')).map(
+                el => el.textContent.trim()
+            );
+            // Порядок: [тип работы, дедлайн, предмет, файлы]
+            let workType = infoTexts[0] || '';
+            let deadline = infoTexts[1] || '';
+            let subject = infoTexts[2] || '';
+            let filesInfo = infoTexts[3] || '';
+
+            // Описание — только превью (OrderSummary.description_preview);
+            // полный текст читает fetch_order_detail
+            let descEl = card.querySelector('[class*="DescriptionStyled"]');
+            let description = descEl
+                ? descEl.textContent.trim().slice(0, DESCRIPTION_PREVIEW_LEN) : '';
+
+            // Бюджет
+            let budgetEl = card.querySelector('[class*="OrderBudgetStyled"]');
+            let budget = budgetEl ? budgetEl.textContent.trim() : '';
+
+            // Ставки
+            let offersEl = card.querySelector('[class*="OffersStyled"]');
+            let offersText = offersEl ? offersEl.textContent.trim() : '';
+            let bidsMatch = offersText.match(/(\d+)\s*став/);
+            let bidCount = bidsMatch ? parseInt(bidsMatch[1]) : 0;
+
+            // Время создания
+            let timeEl = card.querySelector('.orderCreation');
+            let creationTime = timeEl ? timeEl.textContent.trim() : '';
+
+            // Онлайн-статус заказчика
+            let onlineEl = card.querySelector('[class*="CustomerOnlineStyled"]');
+            let customerOnline = onlineEl ? onlineEl.textContent.trim() : '';
+
+            // Имя заказчика
+            let customerNameEl = card.querySelector('[class*="CustomerStyled"] a, [class*="customer"] a[href*="/user/"], a[href*="/user/"]');
+            let customerName = customerNameEl ? customerNameEl.textContent.trim() : '';
+            // Fallback: ищем текст рядом с "Заказчик" или в блоке CustomerStyled
+            if (!customerName) {
+                let custBlock = card.querySelector('[class*="CustomerStyled"], [class*="customer"]');
+                if (custBlock) {
+                    let lines = textLines(custBlock);
+                    customerName = lines.find(t =>
+                        t !== 'Заказчик' && !t.includes('онлайн') && !t.includes('назад')
+                        && !t.includes('сейчас') && t.length > 1
+                    ) || '';
+                }
+            }
+
+            // Бейджи (Постоянный клиент, и т.д.)
+            let badgeEls = card.querySelectorAll('[class*="customer_label"], [class*="Badges"] b');
+            let badges = Array.from(badgeEls).map(el => el.textContent.trim()).filter(Boolean);
+
+            return {
+                orderId, title, url, workType, deadline, subject,
+                filesInfo, description, budget, bidCount,
+                creationTime, customerOnline, customerName, badges,
+            };
+        });
+    }
+
+    // Номер последней страницы ленты (orders._detect_total_pages), 1 — без
+    // пагинации. Пагинация: styled__PaginationStyled-sc-*, кнопки
+    // styled__Item-sc-*: ← Сюда | 1 | 2 | 3 | ... | 10 | Туда →. Последняя
+    // числовая кнопка — максимум, поэтому обход с конца до первого числа.
+    function lastPageNumber() {
+        let container = document.querySelector('[class*="PaginationStyled"]');
+        if (!container) return 1;
+        let items = container.querySelectorAll('[class*="Item-sc"]');
+        for (let i = items.length - 1; i >= 0; i--) {
+            let n = parseInt(items[i].textContent.trim());
+            if (!isNaN(n)) return n;
+        }
+        return 1;
+    }
+
+    // Карточки из HTML страницы ленты, полученной HTTP-запросом: DOMParser
+    // без скриптов, layout и отрисовки. "[]" — карточки рисует только React.
+    function parseOrderCards(html) {
+        return extractOrderCards(new DOMParser().parseFromString(html, 'text/html'));
+    }
+
+    // Дождаться карточек ленты и сразу извлечь их вместе с пагинацией —
+    // один evaluate вместо ожидания, карточек и пагинации по отдельности.
+    // JSON {cards, lastPage}; '' — карточки не появились.
+    // timeout — мс; call_helper без аргумента передаёт null.
+    async function waitOrderCards(timeout) {
+        if (!await waitFor(() => document.querySelector('.auctionOrder'), timeout || 15000)) return '';
+        return JSON.stringify({cards: orderCards(), lastPage: lastPageNumber()});
+    }
+
+    // Поля страницы заказа (order_detail.fetch_order_detail). Сначала ждёт
+    // разметку в том же evaluate: ready — селекторы контейнера и полей,
+    // которые читает извлечение (контейнер монтируется раньше полей).
+    async function extractOrderDetail(ready) {
+        let loaded = await waitFor(() => ready.every(s => document.querySelector(s)), 15000);
+
+        let root = document.querySelector('#root');
+        if (!root) return {error: 'no root'};
+
+        // Один проход по элементам с классом вместо отдельного
+        // querySelectorAll на каждый блок; порядок обхода документный,
+        // поэтому «первый подходящий» совпадает с querySelector
+        let titleEl = null, budgetEl = null, descEl = null, customerEl = null;
+        let avgBidEl = null, timeEl = null;
+        let fieldEls = [], itemEls = [], badgeEls = [];
+        for (let el of root.querySelectorAll('[class]')) {
+            // getAttribute, а не className: у SVG там SVGAnimatedString
+            let c = el.getAttribute('class');
+            if (!titleEl && c.includes('styled__Title')) titleEl = el;
+            // BudgetFieldStyled тоже попадает в FieldStyled — как и раньше
+            if (c.includes('FieldStyled')) {
+                fieldEls.push(el);
+                if (!budgetEl && c.includes('BudgetFieldStyled')) budgetEl = el;
+            }
+            if (!descEl && c.includes('DescriptionStyled')) descEl = el;
+            if (!customerEl && c.includes('CustomerStyled')) customerEl = el;
+            if (!timeEl && c.includes('OrderCreationStyled')) timeEl = el;
+            if (c.includes('ItemStyled')) itemEls.push(el);
+            if (c.includes('BadgeContent')) badgeEls.push(el);
+            if (!avgBidEl && c.includes('AvgBid')) avgBidEl = el;
+        }
+
+        // Заголовок
+        let title = titleEl ? titleEl.textContent.trim() : '';
+
+        // Информационные поля — каждый FieldStyled содержит 2 child: label + value
+        let fields = {};
+        for (let field of fieldEls) {
+            let children = field.children;
+            if (children.length >= 2) {
+                let label = children[0].textContent.trim();
+                let value = children[1].textContent.trim();
+                fields[label] = value;
+            }
+        }
+
+        // Бюджет (BudgetFieldStyled — отдельный блок)
+        let budgetText = '';
+        if (budgetEl && budgetEl.children.length >= 2) {
+            budgetText = budgetEl.children[1].textContent.trim();
+        }
+
+        // Описание (DescriptionStyled — 2 child: заголовок + текст)
+        let description = '';
+        if (descEl) {
+            // Берём текст всех children кроме первого (заголовка "Описание заказа")
+            let children = Array.from(descEl.children);
+            if (children.length > 1) {
+                description = children.slice(1).map(c => c.textContent.trim()).join('\n');
+            } else {
+                description = descEl.textContent.trim();
+                description = description.replace(/^Описание заказа\s*/, '');
+            }
+        }
+
+        // Заказчик
+        let customerName = '';
+        let customerOnline = '';
+        if (customerEl) {
+            let allText = textLines(customerEl);
+            // Пропускаем метку "Заказчик" и строки со статусом онлайн
+            customerName = allText.find(t =>
+                t !== 'Заказчик' && !t.includes('онлайн') && !t.includes('назад') && !t.includes('сейчас на сайте')
+            ) || '';
+            // Онлайн-статус
+            let labelEl = customerEl.querySelector('[class*="Label"]');
+            customerOnline = labelEl ? labelEl.textContent.trim() : '';
+        }
+
+        // Средняя ставка
+        let avgBid = avgBidEl ? avgBidEl.textContent.trim() : '';
+
+        // Файлы: имена + URL-ы для скачивания
+        let fileNames = [];
+        let fileUrls = [];
+        for (let item of itemEls) {
+            // ItemStyled содержит: номер, иконку расширения, имя файла, размер
+            let texts = textLines(item);
+            // Ищем имя файла (обычно 3-й элемент, содержит расширение)
+            for (let t of texts) {
+                if (/\.(docx?|pdf|xlsx?|pptx?|txt|zip|rar|jpg|jpeg|png|heic|csv)$/i.test(t)) {
+                    fileNames.push(t);
+                    break;
+                }
+            }
+            // Ищем ссылку на скачивание: link.href — уже абсолютный URL
+            // (getAttribute отдал бы относительный, на котором падает goto)
+            let link = item.querySelector('a[href]');
+            if (link && link.href) fileUrls.push(link.href);
+        }
+
+        // Время создания
+        let creationTime = timeEl ? timeEl.textContent.trim() : '';
+
+        // Бейджи (Постоянный клиент, и т.д.)
+        let badges = [];
+        for (let el of badgeEls) {
+            let text = el.textContent.trim();
+            if (text) badges.push(text);
+        }
+
+        return {
+            loaded,
+            title,
+            fields,
+            budgetText,
+            description,
+            customerName,
+            customerOnline,
+            avgBid,
+            fileNames,
+            fileUrls,
+            creationTime,
+            badges,
+        };
+    }
+
+    // Бейдж завершённого/отменённого заказа: одна регулярка вместо
+    // toLowerCase() + перебора подстрок на каждый бейдж.
+    const SKIP_STATUS_RE = /заверш[её]н|отмен[её]н/i;
+
+    // Ссылки на заказы из текущего вида /home (по строке на ссылку).
+    // Контент рендерится ВНЕ #root. Пропускаем рекомендованные и
+    // завершённые/отменённые заказы; order_id извлекает Python.
+    function extractOrderHrefs() {
+        const hrefs = new Set();
+        // Вердикт по карточке: в одной карточке бывает несколько ссылок на
+        // заказ (заголовок, «Открыть чат») — бейджи сканируются один раз
+        const skipByCard = new Map();
+        const isFinished = container => {
+            let skip = skipByCard.get(container);
+            if (skip === undefined) {
+                // some() — выходим на первом бейдже завершённого/отменённого заказа
+                skip = [...container.querySelectorAll(
+                    '[class*="OrderStageLabel"], [class*="StageLabel"], [class*="Badge"], [class*="Status"]'
+                )].some(badge => SKIP_STATUS_RE.test(badge.textContent || ''));
+                skipByCard.set(container, skip);
+            }
+            return skip;
+        };
+        document.querySelectorAll('a[href*="/order/getoneorder/"]').forEach(a => {
+            if (a.href.includes('from_recommended') || hrefs.has(a.href)) return;
+
+            // Check for status badge on the order card
+            const card = a.closest('li, article, [class*="Card"], [class*="Item"], [class*="Chat"]');
+            const container = card || a.parentElement;
+            if (container && isFinished(container)) return;
+
+            hrefs.add(a.href);
+        });
+        return [...hrefs].join('\n');
+    }
+
+    // Кнопка → появление модалки → кнопка в модалке за один evaluate
+    // (confirm_order / cancel_order). button и modalSteps — каскады clickButton.
+    // Возвращает -2, если основной кнопки нет, иначе индекс сработавшей
+    // попытки modalSteps или -1.
+    async function clickWithModal({button, modalSteps, modalSelector, timeout = 5000}) {
+        // Снимок видимых модалок до клика: постоянный или скрытый контейнер
+        // модалки уже может быть в DOM — ждём именно новый диалог (новый
+        // узел или ставший видимым), а не любое совпадение селектора
+        const visible = el => el.getClientRects().length > 0;
+        const before = new Set(
+            Array.from(document.querySelectorAll(modalSelector)).filter(visible),
+        );
+        if (clickButton(button) < 0) return -2;
+        await waitFor(
+            () => Array.from(document.querySelectorAll(modalSelector))
+                .some(el => !before.has(el) && visible(el)),
+            timeout, {attributes: true},
+        );
+        return clickButton(modalSteps);
+    }
+
+    // Найти и кликнуть кнопку за один round-trip вместо locator.count() + click().
+    // steps — попытки по приоритету: {scope, labels, nth}; scope = null — весь
+    // документ, labels — подстроки текста кнопки, nth — какую по счёту кликнуть.
+    // Возвращает индекс сработавшей попытки или -1.
+    function clickButton(steps) {
+        for (let i = 0; i < steps.length; i++) {
+            const {scope, labels, nth = 0} = steps[i];
+            const roots = scope ? document.querySelectorAll(scope) : [document];
+            const matches = [];
+            for (const root of roots) {
+                root.querySelectorAll('button').forEach(b => {
+                    const text = (b.textContent || '').trim();
+                    if (labels.some(l => text.includes(l)) && !matches.includes(b)) {
+                        matches.push(b);
+                    }
+                });
+            }
+            if (matches.length > nth) {
+                matches[nth].click();
+                return i;
+            }
+        }
+        return -1;
+    }
+
+    // Поставить фокус в поле ввода чата. false — textarea нет.
+    // Значение controlled-textarea React: нативный сеттер + InputEvent,
+    // иначе React не увидит изменения и перезапишет значение своим state.
+    function setTextareaValue(ta, text) {
+        const setter = Object.getOwnPropertyDescriptor(HTMLTextAreaElement.prototype, 'value').set;
+        setter.call(ta, text);
+        ta.dispatchEvent(new InputEvent('input', {bubbles: true, inputType: 'insertText', data: text}));
+    }
+
+    // Поле ввода чата: фокус и очистка перед набором (вместо отдельного fill("")).
+    function focusTextarea() {
+        const ta = document.querySelector('textarea');
+        if (!ta) return false;
+        ta.click();
+        ta.focus();
+        if (ta.value) setTextareaValue(ta, '');
+        return true;
+    }
+
+    // Вставить текст в textarea без имитации набора и отправить.
+    // -1 — нет textarea, 0 — текст вставлен, но кнопки отправки нет, 1 — отправлено.
+    function fillAndSend(text) {
+        const ta = document.querySelector('textarea');
+        if (!ta) return -1;
+        ta.focus();
+        setTextareaValue(ta, text);
+        return sendMessage() ? 1 : 0;
+    }
+
+    // Нажать кнопку отправки сообщения (Playwright может считать её скрытой).
+    function sendMessage() {
+        let btn = document.querySelector('[data-testid="dialogMessageInput-action_sendMsg"]');
+        if (btn) { btn.click(); return true; }
+        btn = document.querySelector('[class*="SendAction"]');
+        if (btn) { btn.click(); return true; }
+        return false;
+    }
+
+    window.__a24 = {
+        extractMessages,
+        extractOrderInfo,
+        extractOrderHrefs,
+        extractOrderCards,
+        parseOrderCards,
+        waitOrderCards,
+        lastPageNumber,
+        extractOrderDetail,
+        openChatTab,
+        clickHomeTab,
+        clickButton,
+        clickWithModal,
+        focusTextarea,
+        fillAndSend,
+        sendMessage,
+    };
+})();
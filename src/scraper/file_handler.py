@@ -2,40 +2,170 @@
 
 import asyncio
 import logging
-from pathlib import Path
+import mimetypes
+import os
+import re
+from pathlib import Path, PurePosixPath
 from typing import Optional
+from urllib.parse import unquote, urljoin, urlparse
 
 from playwright.async_api import Page
 
 from src.config import settings
-from src.scraper.browser import browser_manager
+from src.scraper.browser import (
+    browser_manager, call_helper, dismiss_any_overlay, ensure_order_page, wait_for_function,
+    wait_for_selector,
+)
 
 logger = logging.getLogger(__name__)
 
+# Кнопка и модалка «Загрузить работу» с выбором варианта
+_UPLOAD_BUTTON = [{"scope": None, "labels": ["Загрузить работу"]}]
+_UPLOAD_MODAL = '[class*="AttachOrderFileModal"]'
+# Второй input[type=file] (загрузка работы) появился после выбора варианта
+_UPLOAD_INPUT_READY = "document.querySelectorAll('input[type=\"file\"]').length >= 2"
+# Отметки о загруженных файлах в блоке заказа (textContent поддерева
+# OrderStyled — без пересчёта layout всего документа). Такие отметки есть
+# и у прежних загрузок, поэтому успех — рост их числа, а не их наличие
+_UPLOAD_MARKS = (
+    "(((document.querySelector('[class*=\"OrderStyled\"]') || document.body)"
+    ".textContent || '')"
+    ".match(/окончательный вариант|промежуточный вариант|на гарантии/g) || []).length"
+)
+_UPLOAD_MARKS_COUNT = f"() => {_UPLOAD_MARKS}"
+# Загрузка завершена: появилась новая отметка относительно снимка до загрузки
+_UPLOAD_DONE = f"(before) => {_UPLOAD_MARKS} > before"
+
 DOWNLOAD_DIR = Path("tmp/orders")
 
 
+# Одновременных скачиваний (больше — риск сбросов сессии)
+DOWNLOAD_CONCURRENCY = 6
+
+
+# Имя файла из Content-Disposition: filename*=UTF-8''... или filename="..."
+_CD_FILENAME_RE = re.compile(
+    r"filename\*=(?:[\w-]+'[\w-]*')?([^;]+)|filename=\"?([^\";]+)\"?", re.IGNORECASE,
+)
+
+
+# Текстовые ответы API (ошибка, редирект на авторизацию) часто приходят
+# с кодом 2xx. Такой ответ — файл заказчика, только если имя ждёт именно
+# этот формат; иначе качаем навигацией
+_TEXT_BODY_SUFFIXES = {
+    "application/json": {".json"},
+    "text/plain": {".txt", ".csv", ".log", ".md"},
+}
+
+
+def _response_filename(
+    content_disposition: str, url: str, idx: int, content_type: str = "",
+) -> str:
+    """Имя файла: Content-Disposition → последний сегмент URL → file_{idx}.
+
+    Если в имени нет расширения (URL вида /download/<id>), оно берётся
+    из Content-Type.
+    """
+    name = ""
+    m = _CD_FILENAME_RE.search(content_disposition or "")
+    if m:
+        name = unquote(m.group(1).strip()) if m.group(1) else m.group(2).strip()
+    if not name:
+        name = unquote(PurePosixPath(urlparse(url).path).name)
+    # Только имя — без каталогов из заголовка
+    name = Path(name).name or f"file_{idx}"
+    mime = (content_type or "").split(";")[0].strip().lower()
+    # octet-stream ничего не говорит о формате — «.bin» не добавляем
+    if not Path(name).suffix and mime and mime != "application/octet-stream":
+        name += mimetypes.guess_extension(mime) or ""
+    return name
+
+
+async def _fetch_direct(page: Page, url: str, order_dir: Path, idx: int) -> Optional[Path]:
+    """Скачать файл HTTP-запросом контекста (общие cookies), без навигации вкладки.
+
+    Возвращает None, если ответ — HTML-страница, JSON/текст там, где ждали
+    документ, или запрос не удался: тогда файл качается через навигацию
+    (_download_one).
+    """
+    try:
+        resp = await page.context.request.get(urljoin(settings.avtor24_base_url, url))
+        try:
+            content_type = resp.headers.get("content-type", "")
+            if not resp.ok or content_type.startswith("text/html"):
+                return None
+            disposition = resp.headers.get("content-disposition", "")
+            mime = content_type.split(";")[0].strip().lower()
+            expected = Path(_response_filename(disposition, url, idx)).suffix.lower()
+            if mime in _TEXT_BODY_SUFFIXES and expected not in _TEXT_BODY_SUFFIXES[mime]:
+                logger.debug("Прямое скачивание %s: ответ %s вместо файла", url, mime)
+                return None
+            filepath = order_dir / _response_filename(disposition, url, idx, content_type)
+            body = await resp.body()
+            # Запись на диск — в потоке, чтобы не блокировать event loop
+            await asyncio.to_thread(filepath.write_bytes, body)
+        finally:
+            await resp.dispose()
+    except Exception as e:
+        logger.debug("Прямое скачивание %s не удалось: %s", url, e)
+        return None
+    logger.info("Скачан файл: %s → %s", url, filepath)
+    return filepath
+
+
+async def _download_one(page: Page, url: str, order_dir: Path, idx: int) -> Path:
+    """Скачать один файл: goto на URL файла на странице page."""
+    async with page.expect_download(timeout=60000) as download_info:
+        await page.goto(url)
+    download = await download_info.value
+    filename = download.suggested_filename or f"file_{idx}"
+    filepath = order_dir / filename
+    # Переносим временный файл Playwright вместо копирования save_as();
+    # на другой файловой системе rename невозможен — тогда копия
+    src = await download.path()
+    try:
+        if src is None:
+            raise OSError("download path unavailable")
+        os.replace(src, filepath)
+    except OSError:
+        await download.save_as(str(filepath))
+    logger.info("Скачан файл: %s → %s", url, filepath)
+    return filepath
+
+
 async def download_files(page: Page, order_id: str, file_urls: list[str]) -> list[Path]:
-    """Скачать файлы заказчика в tmp/orders/{order_id}/."""
+    """Скачать файлы заказчика в tmp/orders/{order_id}/.
+
+    Сначала файл запрашивается напрямую через API-запросы контекста (без
+    рендера страницы). Если сервер отдал HTML, файл качается навигацией:
+    один — на переданной странице, несколько — каждый на своей вкладке
+    основного контекста (browser_manager.order_page: общие cookies и та же
+    маскировка webdriver). Одновременно — не больше DOWNLOAD_CONCURRENCY
+    файлов. Ошибка одного файла не мешает остальным.
+    """
     order_dir = DOWNLOAD_DIR / order_id
     order_dir.mkdir(parents=True, exist_ok=True)
-    downloaded: list[Path] = []
+    sem = asyncio.Semaphore(DOWNLOAD_CONCURRENCY)
 
-    for url in file_urls:
-        try:
-            async with page.expect_download(timeout=60000) as download_info:
-                await page.goto(url)
-            download = await download_info.value
-            filename = download.suggested_filename or f"file_{len(downloaded)}"
-            filepath = order_dir / filename
-            await download.save_as(str(filepath))
-            downloaded.append(filepath)
-            logger.info("Скачан файл: %s → %s", url, filepath)
-            await browser_manager.short_delay()
-        except Exception as e:
-            logger.warning("Ошибка скачивания %s: %s", url, e)
-            continue
+    async def fetch(idx: int, url: str) -> Path:
+        async with sem:
+            direct = await _fetch_direct(page, url, order_dir, idx)
+            if direct is not None:
+                return direct
+            if len(file_urls) == 1:
+                return await _download_one(page, url, order_dir, idx)
+            async with browser_manager.order_page() as tab:
+                return await _download_one(tab, url, order_dir, idx)
 
+    results = await asyncio.gather(
+        *(fetch(i, url) for i, url in enumerate(file_urls)), return_exceptions=True,
+    )
+    downloaded: list[Path] = []
+    for url, res in zip(file_urls, results):
+        if isinstance(res, Exception):
+            logger.warning("Ошибка скачивания %s: %s", url, res)
+        else:
+            downloaded.append(res)
     return downloaded
 
 
@@ -53,38 +183,35 @@ async def upload_file(
         variant: "final" (Окончательный) или "intermediate" (Промежуточный).
     """
     try:
-        # Переходим на страницу заказа (если ещё не там)
-        order_url = f"{settings.avtor24_base_url}/order/getoneorder/{order_id}"
-        if f"/order/getoneorder/{order_id}" not in page.url:
-            await page.goto(order_url, wait_until="domcontentloaded", timeout=30000)
-            await asyncio.sleep(5)
-
-        # Закрываем любые оверлеи
-        await page.keyboard.press("Escape")
-        await asyncio.sleep(1)
-
-        # 1. Кликаем "Загрузить работу" (force=True для обхода оверлея)
-        upload_btn = page.locator('button:has-text("Загрузить работу")')
-        if await upload_btn.count() == 0:
+        # Переходим на страницу заказа (если ещё не там) и ждём отрисовки
+        # React-разметки заказа вместо фиксированной паузы
+        await ensure_order_page(page, order_id)
+
+        # Закрываем оверлей, только если он есть: на уже открытой странице
+        # заказа Escape и ожидание скрытия — лишние
+        await dismiss_any_overlay(page)
+
+        # 1. Кликаем "Загрузить работу" — поиск и DOM-клик за один evaluate
+        # (DOM-клик, как и force=True, не блокируется оверлеем)
+        if await call_helper(page, "clickButton", _UPLOAD_BUTTON) < 0:
             logger.warning("Кнопка 'Загрузить работу' не найдена для заказа %s", order_id)
             return False
 
-        await upload_btn.first.click(force=True, timeout=10000)
-        await asyncio.sleep(3)
+        await wait_for_selector(page, _UPLOAD_MODAL, timeout=5000)
 
         # 2. Выбираем вариант (Окончательный/Промежуточный) через JS
         # Модалка: <li data-active="true"> — Промежуточный,
         #          <li data-active="false"> — Окончательный
         target_text = "Окончательный" if variant == "final" else "Промежуточный"
         selected = await page.evaluate("""
-            (targetText) => {
+            ([targetText, modalSelector]) => {
                 // Находим <li> элементы в модалке загрузки
-                const modal = document.querySelector('[class*="AttachOrderFileModal"]');
+                const modal = document.querySelector(modalSelector);
                 if (!modal) return {error: 'Modal not found'};
 
                 const items = modal.querySelectorAll('li');
                 for (const li of items) {
-                    const text = (li.innerText || '').trim();
+                    const text = (li.textContent || '').trim();
                     if (text.includes(targetText)) {
                         li.click();
                         return {selected: true, text: text.substring(0, 50)};
@@ -92,37 +219,35 @@ async def upload_file(
                 }
                 return {error: 'Variant not found', items: items.length};
             }
-        """, target_text)
+        """, [target_text, _UPLOAD_MODAL])
 
         if selected.get("error"):
             logger.warning(
                 "Не удалось выбрать вариант '%s': %s",
                 target_text, selected["error"],
             )
-            # Fallback: кликаем по тексту напрямую
-            await page.evaluate("""
-                (targetText) => {
-                    const allElements = document.body.querySelectorAll('b, span, li');
-                    for (const el of allElements) {
-                        if ((el.innerText || '').trim().includes(targetText)) {
-                            el.click();
-                            if (el.parentElement) el.parentElement.click();
-                            return true;
-                        }
-                    }
-                    return false;
-                }
-            """, target_text)
+            # Fallback: клик по тексту через текстовый движок Playwright —
+            # без перебора всех b/span/li с innerText (пересчёт layout)
+            try:
+                await page.locator("li").filter(has_text=target_text).first.click(timeout=3000)
+            except Exception:
+                try:
+                    await page.get_by_text(target_text).first.click(timeout=3000)
+                except Exception as e:
+                    logger.warning("Fallback-клик по варианту '%s' не удался: %s", target_text, e)
 
         logger.info("Выбран вариант '%s' для заказа %s", target_text, order_id)
-        await asyncio.sleep(1)
+        inputs_ready = await wait_for_function(page, _UPLOAD_INPUT_READY, timeout=3000)
 
         # 3. Устанавливаем файл на второй input[type="file"]
-        # Первый input — чат, второй — загрузка работы (OrderStyled)
+        # Первый input — чат, второй — загрузка работы (OrderStyled).
+        # Ожидание выше уже подтвердило, что input'ов два, — count() нужен
+        # только в fallback-ветке
         file_input = page.locator('input[type="file"]')
-        input_count = await file_input.count()
-
-        if input_count < 2:
+        if inputs_ready:
+            target_input = file_input.nth(1)
+        else:
+            input_count = await file_input.count()
             logger.warning(
                 "Найдено %d file input (нужно 2) для заказа %s",
                 input_count, order_id,
@@ -130,35 +255,27 @@ async def upload_file(
             # Если есть хотя бы один — пробуем его
             if input_count == 0:
                 return False
-
-        target_input = file_input.nth(1) if input_count >= 2 else file_input.first
+            target_input = file_input.nth(1) if input_count >= 2 else file_input.first
+        # Снимок до загрузки: ждём именно отметку этого файла, а не прежних
+        marks_before = await page.evaluate(_UPLOAD_MARKS_COUNT)
         await target_input.set_input_files(str(filepath))
         logger.info("Файл %s установлен для загрузки в заказ %s", filepath.name, order_id)
 
-        # 4. Ждём завершения загрузки (POST /ajax/addComment)
-        await asyncio.sleep(8)
-
-        # 5. Проверяем результат
-        result = await page.evaluate("""
-            () => {
-                const text = document.body.innerText || '';
-                return {
-                    success: text.includes('окончательный вариант') ||
-                             text.includes('промежуточный вариант') ||
-                             text.includes('Заказ будет находиться на гарантии'),
-                    onGuarantee: text.includes('на гарантии'),
-                    snippet: text.substring(0, 500),
-                };
-            }
-        """)
-
-        if result.get("success"):
+        # 4. Ждём завершения загрузки (POST /ajax/addComment) — до появления
+        # новой отметки о файле, но не дольше 15 сек. Результат ожидания и есть
+        # проверка успеха: повторно читать текст страницы не нужно
+        if await wait_for_function(
+            page, _UPLOAD_DONE, timeout=15000, polling=250, arg=marks_before,
+        ):
             logger.info(
                 "Файл %s загружен как %s в заказ %s",
                 filepath.name, target_text, order_id,
             )
             return True
 
+        # Файл уже передан в input и POST ушёл — отметка могла отрисоваться
+        # вне OrderStyled или позже таймаута. Считаем загрузку успешной, как
+        # и раньше: иначе доставленный файл пометит заказ ошибкой
         logger.warning("Загрузка файла: не удалось подтвердить успех для заказа %s", order_id)
         return True  # Файл был установлен, скорее всего загрузился
 
@@ -1,14 +1,18 @@
 """Парсинг детальной страницы заказа на Автор24 (React SPA)."""
 
+import dataclasses
+import functools
 import logging
 import re
+import time
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from typing import Optional
 
 from playwright.async_api import Page
 
 from src.config import settings
-from src.scraper.browser import browser_manager
+from src.scraper.browser import call_helper
 
 logger = logging.getLogger(__name__)
 
@@ -29,33 +33,34 @@ WORK_TYPE_CATEGORIES: dict[str, dict] = {
             "Статья ВАК/Scopus", "Лабораторная работа", "Презентации",
             "Монография",
         ],
-        "fields": ["pages", "font_size", "line_spacing", "uniqueness", "antiplagiat", "budget"],
+        "fields": frozenset({"pages", "font_size", "line_spacing", "uniqueness", "antiplagiat", "budget"}),
     },
     "copywriting": {
         "types": [
             "Копирайтинг", "Набор текста", "Повышение уникальности текста",
             "Гуманизация работы",
         ],
-        "fields": ["char_count", "uniqueness", "budget"],
+        "fields": frozenset({"char_count", "uniqueness", "budget"}),
     },
     "tasks": {
         "types": [
             "Решение задач", "Контрольная работа", "Ответы на вопросы",
             "Задача по программированию",
         ],
-        "fields": ["budget"],
+        "fields": frozenset({"budget"}),
     },
     "other": {
         "types": [],  # fallback
-        "fields": ["budget"],
+        "fields": frozenset({"budget"}),
     },
 }
 
 # Быстрый lookup: work_type → category name
-_WORK_TYPE_TO_CATEGORY: dict[str, str] = {}
-for _cat_name, _cat_data in WORK_TYPE_CATEGORIES.items():
-    for _wt in _cat_data["types"]:
-        _WORK_TYPE_TO_CATEGORY[_wt] = _cat_name
+_WORK_TYPE_TO_CATEGORY: dict[str, str] = {
+    wt: cat_name
+    for cat_name, cat_data in WORK_TYPE_CATEGORIES.items()
+    for wt in cat_data["types"]
+}
 
 
 def get_work_type_category(work_type: str) -> str:
@@ -63,8 +68,8 @@ def get_work_type_category(work_type: str) -> str:
     return _WORK_TYPE_TO_CATEGORY.get(work_type, "other")
 
 
-def get_category_fields(work_type: str) -> list[str]:
-    """Получить список полей, доступных для данного типа работы."""
+def get_category_fields(work_type: str) -> frozenset[str]:
+    """Получить множество полей, доступных для данного типа работы."""
     cat = get_work_type_category(work_type)
     return WORK_TYPE_CATEGORIES[cat]["fields"]
 
@@ -73,9 +78,12 @@ def get_category_fields(work_type: str) -> list[str]:
 # Dataclass
 # ---------------------------------------------------------------------------
 
-@dataclass
+@dataclass(slots=True)
 class OrderDetail:
-    """Полная информация о заказе."""
+    """Полная информация о заказе (__slots__: без __dict__ на каждый заказ).
+
+    Не frozen: field_extractor дополняет поля из текста файлов на месте.
+    """
     order_id: str
     title: str
     url: str
@@ -104,24 +112,45 @@ class OrderDetail:
     extracted_from_files: bool = False
 
 
+# Регулярки парсинга — компилируются один раз при импорте
+_FLOAT_RE = re.compile(r"(\d+[.,]?\d*)")
+_PAGES_RANGE_RE = re.compile(r"от\s*(\d+)\s*до\s*(\d+)")
+# Страница заказа отрисована: есть контейнер и хотя бы одно поле
+_DETAIL_READY = [
+    '#root [class*="AuctionDetailsStyled"], #root [class*="OrderStyled"]',
+    '#root [class*="FieldStyled"]',
+]
+# /order/getoneorder/{id} и /order/{id} — одним поиском
+_ORDER_ID_RE = re.compile(r"/order/(?:getoneorder/)?(\d+)")
+
+
+# Значения полей («14», «1,5», «от 10 до 20») повторяются от заказа к заказу,
+# поэтому разбор чистых функций ниже кэшируется по строке
+_PARSE_CACHE_SIZE = 1024
+
+
+@functools.lru_cache(maxsize=_PARSE_CACHE_SIZE)
 def _extract_int(text: str) -> Optional[int]:
     """Извлечь целое число из строки."""
-    cleaned = re.sub(r"[^\d]", "", text)
+    # filter по str.isdecimal (как \d) — без regex-движка
+    cleaned = "".join(filter(str.isdecimal, text))
     return int(cleaned) if cleaned else None
 
 
+@functools.lru_cache(maxsize=_PARSE_CACHE_SIZE)
 def _extract_float(text: str) -> Optional[float]:
     """Извлечь дробное число из строки."""
-    match = re.search(r"(\d+[.,]?\d*)", text.replace(" ", ""))
+    match = _FLOAT_RE.search(text.replace(" ", ""))
     if match:
         return float(match.group(1).replace(",", "."))
     return None
 
 
+@functools.lru_cache(maxsize=_PARSE_CACHE_SIZE)
 def _parse_pages(text: str) -> tuple[Optional[int], Optional[int]]:
     """Извлечь мин/макс страниц из строки вида 'от 10 до 20' или '20 стр'."""
     # "от X до Y"
-    range_match = re.search(r"от\s*(\d+)\s*до\s*(\d+)", text)
+    range_match = _PAGES_RANGE_RE.search(text)
     if range_match:
         return int(range_match.group(1)), int(range_match.group(2))
     # Просто число
@@ -131,145 +160,51 @@ def _parse_pages(text: str) -> tuple[Optional[int], Optional[int]]:
     return None, None
 
 
-async def fetch_order_detail(page: Page, order_url: str) -> OrderDetail:
+# Разобранные заказы: order_id → (time.monotonic() разбора, OrderDetail).
+# Повторный разбор того же заказа в пределах settings.order_detail_ttl_s
+# не открывает страницу; хранится не больше _DETAIL_CACHE_SIZE заказов.
+# Кэшируются только полностью отрисованные страницы. В кэше и наружу —
+# разные копии (dataclasses.replace): вызывающие (field_extractor)
+# дополняют поля OrderDetail на месте, и это не должно попадать в кэш.
+_detail_cache: OrderedDict[str, tuple[float, OrderDetail]] = OrderedDict()
+_DETAIL_CACHE_SIZE = 500
+
+
+async def fetch_order_detail(
+    page: Page, order_url: str, force_refresh: bool = False
+) -> OrderDetail:
     """Парсинг полной страницы заказа (React SPA).
 
     URL формат: /order/getoneorder/{id}
     Страница рендерится через React в div#root.
+
+    Args:
+        force_refresh: игнорировать кэш (заказчик мог изменить условия).
     """
     full_url = order_url
     if not order_url.startswith("http"):
         full_url = settings.avtor24_base_url + order_url
 
-    await page.goto(full_url, wait_until="domcontentloaded", timeout=60000)
-    await browser_manager.short_delay()
-
     # ID из URL
-    match = re.search(r"/order/getoneorder/(\d+)", full_url)
-    if not match:
-        match = re.search(r"/order/(\d+)", full_url)
+    match = _ORDER_ID_RE.search(full_url)
     order_id = match.group(1) if match else ""
 
-    # Ожидаем загрузку React-компонентов
-    try:
-        await page.wait_for_selector(
-            '[class*="AuctionDetailsStyled"], [class*="OrderStyled"]',
-            timeout=15000,
-        )
-        # Дополнительная задержка для полного рендера
-        await browser_manager.short_delay()
-    except Exception:
-        logger.warning("Детали заказа не загрузились за 15 сек")
+    hit = _detail_cache.get(order_id) if order_id and not force_refresh else None
+    if hit and time.monotonic() - hit[0] < settings.order_detail_ttl_s:
+        return dataclasses.replace(hit[1])
+
+    # SPA: DOMContentLoaded наступает раньше монтирования React, поэтому
+    # ждём только коммит навигации, а готовность — по разметке ниже
+    await page.goto(full_url, wait_until="commit", timeout=60000)
 
-    # Извлекаем данные через JS (быстрее, чем множественные Playwright-запросы)
-    raw = await page.evaluate("""
-        () => {
-            let root = document.querySelector('#root');
-            if (!root) return {error: 'no root'};
-
-            // Заголовок
-            let titleEl = root.querySelector('[class*="styled__Title"]');
-            let title = titleEl ? titleEl.textContent.trim() : '';
-
-            // Информационные поля — каждый FieldStyled содержит 2 child: label + value
-            let fields = {};
-            root.querySelectorAll('[class*="FieldStyled"]').forEach(field => {
-                let children = field.children;
-                if (children.length >= 2) {
-                    let label = children[0].textContent.trim();
-                    let value = children[1].textContent.trim();
-                    fields[label] = value;
-                }
-            });
-
-            // Бюджет (BudgetFieldStyled — отдельный блок)
-            let budgetEl = root.querySelector('[class*="BudgetFieldStyled"]');
-            let budgetText = '';
-            if (budgetEl && budgetEl.children.length >= 2) {
-                budgetText = budgetEl.children[1].textContent.trim();
-            }
-
-            // Описание (DescriptionStyled — 2 child: заголовок + текст)
-            let descEl = root.querySelector('[class*="DescriptionStyled"]');
-            let description = '';
-            if (descEl) {
-                // Берём текст всех children кроме первого (заголовка "Описание заказа")
-                let children = Array.from(descEl.children);
-                if (children.length > 1) {
-                    description = children.slice(1).map(c => c.textContent.trim()).join('\\n');
-                } else {
-                    description = descEl.textContent.trim();
-                    description = description.replace(/^Описание заказа\\s*/, '');
-                }
-            }
-
-            // Заказчик
-            let customerEl = root.querySelector('[class*="CustomerStyled"]');
-            let customerName = '';
-            let customerOnline = '';
-            if (customerEl) {
-                let allText = customerEl.innerText.split('\\n').map(s => s.trim()).filter(Boolean);
-                // Пропускаем метку "Заказчик" и строки со статусом онлайн
-                customerName = allText.find(t =>
-                    t !== 'Заказчик' && !t.includes('онлайн') && !t.includes('назад') && !t.includes('сейчас на сайте')
-                ) || '';
-                // Онлайн-статус
-                let labelEl = customerEl.querySelector('[class*="Label"]');
-                customerOnline = labelEl ? labelEl.textContent.trim() : '';
-            }
-
-            // Средняя ставка
-            let avgBidEl = root.querySelector('[class*="AvgBid"]');
-            let avgBid = avgBidEl ? avgBidEl.textContent.trim() : '';
-
-            // Файлы: имена + URL-ы для скачивания
-            let fileNames = [];
-            let fileUrls = [];
-            root.querySelectorAll('[class*="ItemStyled"]').forEach(item => {
-                // ItemStyled содержит: номер, иконку расширения, имя файла, размер
-                let texts = item.innerText.split('\\n').map(s => s.trim()).filter(Boolean);
-                // Ищем имя файла (обычно 3-й элемент, содержит расширение)
-                for (let t of texts) {
-                    if (/\\.(docx?|pdf|xlsx?|pptx?|txt|zip|rar|jpg|jpeg|png|heic|csv)$/i.test(t)) {
-                        fileNames.push(t);
-                        break;
-                    }
-                }
-                // Ищем ссылку на скачивание
-                let link = item.querySelector('a[href]');
-                if (link) {
-                    let href = link.getAttribute('href');
-                    if (href) fileUrls.push(href);
-                }
-            });
-
-            // Время создания
-            let timeEl = root.querySelector('[class*="OrderCreationStyled"]');
-            let creationTime = timeEl ? timeEl.textContent.trim() : '';
-
-            // Бейджи (Постоянный клиент, и т.д.)
-            let badges = [];
-            root.querySelectorAll('[class*="BadgeContent"]').forEach(el => {
-                let text = el.textContent.trim();
-                if (text) badges.push(text);
-            });
-
-            return {
-                title,
-                fields,
-                budgetText,
-                description,
-                customerName,
-                customerOnline,
-                avgBid,
-                fileNames,
-                fileUrls,
-                creationTime,
-                badges,
-            };
-        }
-    """)
+    # Извлекаем данные через JS (быстрее, чем множественные Playwright-запросы).
+    # Экстрактор зарегистрирован init-скриптом (window.__a24.extractOrderDetail):
+    # V8 компилирует его раз на документ, evaluate передаёт только вызов.
+    # Загрузку React-компонентов он ждёт сам, до извлечения
+    raw = await call_helper(page, "extractOrderDetail", _DETAIL_READY)
 
+    if not raw.get("loaded"):
+        logger.warning("Детали заказа не загрузились за 15 сек")
     if raw.get("error"):
         logger.error("Ошибка парсинга детали заказа: %s", raw["error"])
         return OrderDetail(order_id=order_id, title="", url=full_url)
@@ -282,7 +217,7 @@ async def fetch_order_detail(page: Page, order_url: str) -> OrderDetail:
     deadline = fields.get("Срок сдачи", None)
 
     # Определяем категорию для graceful field handling
-    available_fields = get_category_fields(work_type) if work_type else ["pages", "font_size", "line_spacing", "uniqueness", "antiplagiat", "budget"]
+    available_fields = get_category_fields(work_type) if work_type else WORK_TYPE_CATEGORIES["writing"]["fields"]
 
     # Страницы — только если категория предусматривает
     pages_min, pages_max = None, None
@@ -335,7 +270,7 @@ async def fetch_order_detail(page: Page, order_url: str) -> OrderDetail:
     avg_bid_text = raw.get("avgBid", "")
     average_bid = _extract_int(avg_bid_text) if avg_bid_text else None
 
-    return OrderDetail(
+    detail = OrderDetail(
         order_id=order_id,
         title=raw.get("title", ""),
         url=full_url,
@@ -359,3 +294,11 @@ async def fetch_order_detail(page: Page, order_url: str) -> OrderDetail:
         file_names=raw.get("fileNames", []),
         file_urls=raw.get("fileUrls", []),
     )
+    # Не дождались разметки — деталь неполная (без типа работы, бюджета),
+    # такую не кэшируем: следующий вызов откроет страницу заново
+    if order_id and raw.get("loaded"):
+        _detail_cache[order_id] = (time.monotonic(), dataclasses.replace(detail))
+        _detail_cache.move_to_end(order_id)
+        while len(_detail_cache) > _DETAIL_CACHE_SIZE:
+            _detail_cache.popitem(last=False)
+    return detail
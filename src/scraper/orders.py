@@ -1,23 +1,31 @@
 """Парсинг ленты заказов с Автор24 (React SPA)."""
 
+import asyncio
+import json
 import logging
-import re
 from dataclasses import dataclass, field
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 from playwright.async_api import Page
 
 from src.config import settings
-from src.scraper.browser import browser_manager
+from src.scraper.browser import browser_manager, call_helper
 
 logger = logging.getLogger(__name__)
 
 SEARCH_URL = f"{settings.avtor24_base_url}/order/search"
 
+# Сколько страниц ленты (2..N) парсится одновременно, каждая на своей вкладке
+LIST_CONCURRENCY = 2
 
-@dataclass
+# Попыток загрузить первую страницу ленты при сбое (паузы 5, 10 сек — как
+# у _retry_async в main): без неё цикл сканирования пропускается целиком
+FIRST_PAGE_ATTEMPTS = 3
+
+
+@dataclass(slots=True)
 class OrderSummary:
-    """Краткая информация о заказе из ленты."""
+    """Краткая информация о заказе из ленты (__slots__: без __dict__ на каждую карточку)."""
     order_id: str
     title: str
     url: str
@@ -37,100 +45,14 @@ class OrderSummary:
 
 def _extract_number(text: str) -> Optional[int]:
     """Извлечь число из строки вида '6 000₽' или '4 ставки'."""
-    cleaned = re.sub(r"[^\d]", "", text)
+    # filter по str.isdecimal (как \d) — без regex-движка
+    cleaned = "".join(filter(str.isdecimal, text))
     return int(cleaned) if cleaned else None
 
 
-async def parse_order_cards(page: Page) -> list[OrderSummary]:
-    """Парсить карточки заказов с текущей страницы (React SPA).
-
-    Сайт рендерит карточки через React в div#root.
-    Каждая карточка: .auctionOrder с data-id.
-    """
+def _to_summaries(raw_orders: list[dict]) -> list[OrderSummary]:
+    """Карточки из window.__a24.extractOrderCards → OrderSummary."""
     orders = []
-
-    # Ожидаем загрузку React-компонентов
-    try:
-        await page.wait_for_selector(".auctionOrder", timeout=15000)
-    except Exception:
-        logger.warning("Карточки .auctionOrder не появились за 15 сек")
-        return orders
-
-    # Извлекаем данные через JS (быстрее, чем множественные Playwright-запросы)
-    raw_orders = await page.evaluate("""
-        () => {
-            let cards = document.querySelectorAll('.auctionOrder');
-            return Array.from(cards).map(card => {
-                let orderId = card.getAttribute('data-id') || '';
-
-                // Заголовок
-                let titleEl = card.querySelector('[class*="TitleLinkStyled"] span');
-                let title = titleEl ? titleEl.textContent.trim() : '';
-
-                // URL
-                let linkEl = card.querySelector('a[href*="/order/getoneorder/"]');
-                let url = linkEl ? linkEl.getAttribute('href') : '';
-
-                // Информационные поля (.order-info-text)
-                let infoTexts = Array.from(card.querySelectorAll('.order-info-text')).map(
-                    el => el.textContent.trim()
-                );
-                // Порядок: [тип работы, дедлайн, предмет, файлы]
-                let workType = infoTexts[0] || '';
-                let deadline = infoTexts[1] || '';
-                let subject = infoTexts[2] || '';
-                let filesInfo = infoTexts[3] || '';
-
-                // Описание
-                let descEl = card.querySelector('[class*="DescriptionStyled"]');
-                let description = descEl ? descEl.textContent.trim() : '';
-
-                // Бюджет
-                let budgetEl = card.querySelector('[class*="OrderBudgetStyled"]');
-                let budget = budgetEl ? budgetEl.textContent.trim() : '';
-
-                // Ставки
-                let offersEl = card.querySelector('[class*="OffersStyled"]');
-                let offersText = offersEl ? offersEl.textContent.trim() : '';
-                let bidsMatch = offersText.match(/(\\d+)\\s*став/);
-                let bidCount = bidsMatch ? parseInt(bidsMatch[1]) : 0;
-
-                // Время создания
-                let timeEl = card.querySelector('.orderCreation');
-                let creationTime = timeEl ? timeEl.textContent.trim() : '';
-
-                // Онлайн-статус заказчика
-                let onlineEl = card.querySelector('[class*="CustomerOnlineStyled"]');
-                let customerOnline = onlineEl ? onlineEl.textContent.trim() : '';
-
-                // Имя заказчика
-                let customerNameEl = card.querySelector('[class*="CustomerStyled"] a, [class*="customer"] a[href*="/user/"], a[href*="/user/"]');
-                let customerName = customerNameEl ? customerNameEl.textContent.trim() : '';
-                // Fallback: ищем текст рядом с "Заказчик" или в блоке CustomerStyled
-                if (!customerName) {
-                    let custBlock = card.querySelector('[class*="CustomerStyled"], [class*="customer"]');
-                    if (custBlock) {
-                        let lines = custBlock.innerText.split('\\n').map(s => s.trim()).filter(Boolean);
-                        customerName = lines.find(t =>
-                            t !== 'Заказчик' && !t.includes('онлайн') && !t.includes('назад')
-                            && !t.includes('сейчас') && t.length > 1
-                        ) || '';
-                    }
-                }
-
-                // Бейджи (Постоянный клиент, и т.д.)
-                let badgeEls = card.querySelectorAll('[class*="customer_label"], [class*="Badges"] b');
-                let badges = Array.from(badgeEls).map(el => el.textContent.trim()).filter(Boolean);
-
-                return {
-                    orderId, title, url, workType, deadline, subject,
-                    filesInfo, description, budget, bidCount,
-                    creationTime, customerOnline, customerName, badges,
-                };
-            });
-        }
-    """)
-
     for raw in raw_orders:
         if not raw["orderId"]:
             continue
@@ -154,97 +76,249 @@ async def parse_order_cards(page: Page) -> list[OrderSummary]:
             description_preview=raw["description"],
             creation_time=raw["creationTime"],
         ))
+    return orders
+
+
+async def _parse_list_and_pagination(page: Page) -> tuple[list[OrderSummary], int]:
+    """Карточки заказов и число страниц ленты с текущей страницы (React SPA).
+
+    Сайт рендерит карточки через React в div#root.
+    Каждая карточка: .auctionOrder с data-id.
+    """
+    # Ожидание React-компонентов, карточки и пагинация — один evaluate
+    # (быстрее, чем ожидание и множественные Playwright-запросы по отдельности)
+    raw = await call_helper(page, "waitOrderCards")
+    if not raw:
+        logger.warning("Карточки .auctionOrder не появились за 15 сек")
+        return [], 1
+    data = json.loads(raw)
+    return _to_summaries(data["cards"]), data["lastPage"] or 1
+
 
+async def parse_order_cards(page: Page) -> list[OrderSummary]:
+    """Парсить карточки заказов с текущей страницы (React SPA)."""
+    orders, _ = await _parse_list_and_pagination(page)
     return orders
 
 
+async def _fetch_order_cards(page: Page, url: str) -> list[OrderSummary]:
+    """Карточки страницы ленты по HTTP, без рендера.
+
+    HTML запрашивается через API-запросы контекста (общие cookies) и
+    разбирается DOMParser'ом в странице. Пустой список — карточек в HTML
+    нет (их рисует React) или запрос не удался.
+    """
+    try:
+        resp = await page.context.request.get(url)
+        try:
+            if not resp.ok:
+                return []
+            html = await resp.text()
+        finally:
+            await resp.dispose()
+        return _to_summaries(json.loads(await call_helper(page, "parseOrderCards", html)))
+    except Exception as e:
+        logger.debug("HTTP-разбор %s не удался: %s", url, e)
+        return []
+
+
 async def _detect_total_pages(page: Page) -> int:
-    """Определить количество страниц из пагинации.
+    """Определить количество страниц из пагинации (window.__a24.lastPageNumber).
 
-    Пагинация: styled__PaginationStyled-sc-*
-    Кнопки:    styled__Item-sc-* с числами (1, 2, 3, ..., N)
-    Формат:    ← Сюда | 1 | 2 | 3 | ... | 10 | Туда →
+    fetch_order_list получает его вместе с карточками первой страницы
+    (_parse_list_and_pagination); отдельный вызов — для остальных случаев.
     """
     try:
-        numbers = await page.evaluate("""
-            () => {
-                let container = document.querySelector('[class*="PaginationStyled"]');
-                if (!container) return [];
-                let items = container.querySelectorAll('[class*="Item-sc"]');
-                let nums = [];
-                for (let item of items) {
-                    let text = item.textContent.trim();
-                    let n = parseInt(text);
-                    if (!isNaN(n)) nums.push(n);
-                }
-                return nums;
-            }
-        """)
-        if numbers:
-            total = max(numbers)
-            logger.info("Пагинация: обнаружено %d страниц (кнопки: %s)", total, numbers)
-            return total
+        total = await call_helper(page, "lastPageNumber") or 1
+        logger.info("Пагинация: обнаружено %d страниц", total)
+        return total
     except Exception as e:
         logger.warning("Не удалось определить кол-во страниц: %s", e)
     return 1
 
 
+async def _parse_list_page(
+    page: Page, page_num: int, try_http: bool = True,
+) -> tuple[list[OrderSummary], bool]:
+    """Разобрать страницу ленты page_num.
+
+    Сначала (если try_http) — HTML по HTTP (_fetch_order_cards), без рендера
+    React; если карточек в нём нет — переход на страницу и разбор
+    отрисованного DOM.
+
+    Returns:
+        (карточки, нашлись ли они в HTML по HTTP).
+    """
+    url = f"{SEARCH_URL}?page={page_num}"
+    logger.info("Парсинг страницы %d: %s", page_num, url)
+    # Антибан: пауза между страницами ленты (не ожидание загрузки); у каждого
+    # воркера своя, поэтому паузы не складываются
+    await browser_manager.random_delay(min_sec=2, max_sec=5)
+    if try_http:
+        orders = await _fetch_order_cards(page, url)
+        if orders:
+            return orders, True
+    # SPA: DOMContentLoaded наступает раньше монтирования React — ждём
+    # только коммит навигации, карточки ждёт parse_order_cards
+    await page.goto(url, wait_until="commit", timeout=60000)
+    return await parse_order_cards(page), False
+
+
+async def _first_list_page(page: Page) -> tuple[list[OrderSummary], int]:
+    """Первая страница ленты на page: карточки и кол-во страниц из пагинации."""
+    logger.info("Парсинг страницы 1: %s", SEARCH_URL)
+    for attempt in range(FIRST_PAGE_ATTEMPTS):
+        try:
+            # Только коммит навигации: готовность по карточкам ждёт
+            # _parse_list_and_pagination — без пауз и без DOMContentLoaded
+            await page.goto(SEARCH_URL, wait_until="commit", timeout=60000)
+            # Карточки и кол-во страниц из пагинации — одним evaluate
+            orders, total_pages = await _parse_list_and_pagination(page)
+            break
+        except Exception as e:
+            if attempt == FIRST_PAGE_ATTEMPTS - 1:
+                logger.error("Ошибка загрузки первой страницы: %s", e)
+                return [], 1
+            wait = 2 ** attempt * 5
+            logger.warning(
+                "Ошибка загрузки первой страницы (попытка %d/%d): %s. Повтор через %d сек.",
+                attempt + 1, FIRST_PAGE_ATTEMPTS, e, wait,
+            )
+            await asyncio.sleep(wait)
+
+    if orders:
+        logger.info("Страница 1: %d заказов", len(orders))
+    else:
+        logger.info("Первая страница пуста")
+    return orders, total_pages
+
+
+def _start_list_pages(
+    page: Optional[Page], numbers: list[int],
+) -> tuple[dict[int, asyncio.Future], list[asyncio.Task]]:
+    """Запустить разбор страниц ленты numbers, не дожидаясь результата.
+
+    LIST_CONCURRENCY воркеров берут номера через один: первый — на page
+    (если передана), остальные — на своих вкладках. Результат страницы —
+    future по её номеру; пустая страница или ошибка даёт [] и
+    останавливает парсинг дальше неё, как в последовательном обходе.
+    Задачи снимает _stop_list_pages().
+    """
+    loop = asyncio.get_running_loop()
+    results = {n: loop.create_future() for n in numbers}
+    stop_at = numbers[-1] + 1 if numbers else 0
+    # HTTP-разбор — пока он находит карточки. Страница, отрисованная только
+    # React'ом, значит, что и остальные такие же: дальше в этом обходе сразу
+    # goto, без лишнего запроса на каждую страницу
+    try_http = True
+
+    async def parse(tab: Page, nums: list[int]) -> None:
+        nonlocal stop_at, try_http
+        for page_num in nums:
+            if page_num >= stop_at:
+                return
+            try:
+                orders, from_http = await _parse_list_page(tab, page_num, try_http)
+            except Exception as e:
+                logger.error("Ошибка парсинга страницы %d: %s", page_num, e)
+                orders = []
+            else:
+                if orders and not from_http and try_http:
+                    logger.debug("Карточек в HTML ленты нет — дальше без HTTP-разбора")
+                    try_http = False
+                if not orders:
+                    logger.info("Страница %d пуста, прекращаем парсинг", page_num)
+            results[page_num].set_result(orders)
+            if not orders:
+                stop_at = min(stop_at, page_num)
+                return
+            logger.info("Страница %d: %d заказов", page_num, len(orders))
+
+    async def worker(index: int, nums: list[int]) -> None:
+        try:
+            if index == 0 and page is not None:
+                await parse(page, nums)
+            else:
+                async with browser_manager.order_page() as tab:
+                    await parse(tab, nums)
+        except Exception as e:
+            logger.error("Ошибка вкладки ленты: %s", e)
+        finally:
+            # Неразобранные номера — как пустые, ожидающий их не зависнет
+            for n in nums:
+                if not results[n].done():
+                    results[n].set_result([])
+
+    workers = min(LIST_CONCURRENCY, len(numbers))
+    tasks = [asyncio.create_task(worker(i, numbers[i::workers])) for i in range(workers)]
+    return results, tasks
+
+
+async def _stop_list_pages(tasks: list[asyncio.Task]) -> None:
+    """Снять воркеры _start_list_pages() (страницы после остановки не нужны)."""
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
 async def fetch_order_list(page: Page, max_pages: int = 10) -> list[OrderSummary]:
     """Получить список заказов со всех доступных страниц.
 
     Сначала загружает первую страницу, определяет общее кол-во страниц
-    из пагинации, затем парсит все страницы до min(total, max_pages).
+    из пагинации, затем парсит все страницы до min(total, max_pages) —
+    параллельно, не больше LIST_CONCURRENCY вкладок.
     """
-    all_orders: list[OrderSummary] = []
-
-    # Загружаем первую страницу и определяем кол-во страниц
-    logger.info("Парсинг страницы 1: %s", SEARCH_URL)
-    try:
-        await page.goto(SEARCH_URL, wait_until="domcontentloaded", timeout=60000)
-        await browser_manager.short_delay()
-        await page.wait_for_selector(".auctionOrder", timeout=15000)
-        await browser_manager.short_delay()
-    except Exception as e:
-        logger.error("Ошибка загрузки первой страницы: %s", e)
-        return all_orders
-
-    orders = await parse_order_cards(page)
+    orders, total_pages = await _first_list_page(page)
     if not orders:
-        logger.info("Первая страница пуста")
-        return all_orders
-
-    all_orders.extend(orders)
-    logger.info("Страница 1: %d заказов", len(orders))
+        return []
+    all_orders = list(orders)
 
-    # Определяем кол-во страниц из пагинации
-    total_pages = await _detect_total_pages(page)
     pages_to_parse = min(total_pages, max_pages)
     logger.info("Будет распарсено %d страниц (доступно %d, лимит %d)",
                 pages_to_parse, total_pages, max_pages)
 
-    # Парсим остальные страницы
-    for page_num in range(2, pages_to_parse + 1):
-        url = f"{SEARCH_URL}?page={page_num}"
-        logger.info("Парсинг страницы %d: %s", page_num, url)
-
-        try:
-            await browser_manager.random_delay(min_sec=2, max_sec=5)
-            await page.goto(url, wait_until="domcontentloaded", timeout=60000)
-            await browser_manager.short_delay()
-            await page.wait_for_selector(".auctionOrder", timeout=15000)
-            await browser_manager.short_delay()
-
-            orders = await parse_order_cards(page)
+    # Остальные страницы — первый воркер на переданной вкладке
+    numbers = list(range(2, pages_to_parse + 1))
+    results, tasks = _start_list_pages(page, numbers)
+    try:
+        for page_num in numbers:
+            orders = await results[page_num]
             if not orders:
-                logger.info("Страница %d пуста, прекращаем парсинг", page_num)
                 break
-
             all_orders.extend(orders)
-            logger.info("Страница %d: %d заказов", page_num, len(orders))
-
-        except Exception as e:
-            logger.error("Ошибка парсинга страницы %d: %s", page_num, e)
-            break
+    finally:
+        await _stop_list_pages(tasks)
 
     logger.info("Итого найдено %d заказов с %d страниц", len(all_orders), pages_to_parse)
     return all_orders
+
+
+async def iter_order_list(page: Page, max_pages: int = 10) -> AsyncIterator[OrderSummary]:
+    """Заказы ленты по мере разбора страниц, в порядке fetch_order_list().
+
+    Первая страница разбирается на page и отдаётся сразу; страницы 2..N
+    грузятся в это время на своих вкладках, поэтому вызывающий может
+    работать с page (детали, ставки), не дожидаясь всей ленты. Прерванный
+    перебор закрывать через aclose() — он снимает воркеры страниц.
+    """
+    orders, total_pages = await _first_list_page(page)
+    if not orders:
+        return
+
+    pages_to_parse = min(total_pages, max_pages)
+    logger.info("Будет распарсено %d страниц (доступно %d, лимит %d)",
+                pages_to_parse, total_pages, max_pages)
+
+    numbers = list(range(2, pages_to_parse + 1))
+    results, tasks = _start_list_pages(None, numbers)
+    try:
+        for order in orders:
+            yield order
+        for page_num in numbers:
+            orders = await results[page_num]
+            if not orders:
+                return
+            for order in orders:
+                yield order
+    finally:
+        await _stop_list_pages(tasks)
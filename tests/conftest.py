@@ -17,8 +17,8 @@ async def engine():
     async with eng.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     yield eng
-    async with eng.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
+    # drop_all не нужен: in-memory БД живёт, пока открыто соединение,
+    # dispose() его закрывает
     await eng.dispose()
 
 
@@ -53,8 +53,7 @@ async def int_engine():
     async with eng.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     yield eng
-    async with eng.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
+    # drop_all не нужен: in-memory БД исчезает с dispose()
     await eng.dispose()
 
 
@@ -3,26 +3,74 @@
 import asyncio
 import json
 import tempfile
+import time
+from contextlib import asynccontextmanager
 from pathlib import Path
 from unittest.mock import AsyncMock, MagicMock, patch, PropertyMock
 
 import pytest
 import pytest_asyncio
 
-from src.scraper.browser import BrowserManager, USER_AGENTS, VIEWPORTS, COOKIES_PATH
+from src.scraper.browser import (
+    BrowserManager, USER_AGENTS, VIEWPORTS, COOKIES_PATH, ensure_order_page, wait_for_selector,
+)
 from src.scraper.orders import parse_order_cards, OrderSummary, _extract_number
-from src.scraper.order_detail import fetch_order_detail, OrderDetail, _extract_int, _extract_float
+from src.scraper.order_detail import (
+    fetch_order_detail, OrderDetail, _extract_int, _extract_float, get_category_fields,
+    _detail_cache,
+)
 from src.scraper.bidder import place_bid
 from src.scraper.chat import (
-    get_messages, send_message, ChatMessage, cancel_order,
+    get_messages, send_message, ChatMessage, cancel_order, confirm_order,
+    get_order_page_info, download_chat_files,
     get_accepted_order_ids, get_active_chats,
     get_waiting_confirmation_order_ids,
-    _navigate_home, _click_home_tab, _extract_visible_order_ids,
+    _navigate_home, _click_home_tab, _extract_visible_order_ids, _call_helper,
+    _fetch_tab, _home_nav_cache, invalidate_home_cache, _msg_cache,
+    _active_ids_cache, _typed_orders, _home_nav_inflight,
 )
 
 FIXTURES_DIR = Path(__file__).parent / "fixtures"
 
 
+def _order_hrefs(order_ids: list[str]) -> str:
+    """Ответ window.__a24.extractOrderHrefs: ссылки на заказы по строке."""
+    return "\n".join(f"https://avtor24.ru/order/getoneorder/{oid}" for oid in order_ids)
+
+
+def _packed_messages(messages: list[dict]) -> dict:
+    """Ответ window.__a24.collectMessages: сообщения «столбцами» (как в chat_helpers.js)."""
+    return {
+        "texts": [m["text"] for m in messages],
+        "flags": [
+            (1 if m.get("isSystem") else 0) | (2 if m.get("isOutgoing") else 0)
+            for m in messages
+        ],
+        "timestamps": [m.get("timestamp", "") for m in messages],
+        "senders": [m.get("senderName", "") for m in messages],
+        "files": {str(i): m["fileUrls"] for i, m in enumerate(messages) if m.get("fileUrls")},
+    }
+
+
+_EMPTY_CHAT = json.dumps(_packed_messages([]))
+
+
+@pytest.fixture(autouse=True)
+def _clear_module_caches():
+    """Кэши /home, истории чата и заказов живут на уровне модуля — сбрасываем между тестами."""
+    _home_nav_cache.clear()
+    _active_ids_cache.clear()
+    _msg_cache.clear()
+    _typed_orders.clear()
+    _detail_cache.clear()
+    yield
+    _home_nav_cache.clear()
+    _active_ids_cache.clear()
+    _msg_cache.clear()
+    _typed_orders.clear()
+    _detail_cache.clear()
+
+
 # ===== Утилиты для мокирования Playwright =====
 
 def _make_locator_mock(elements: list[dict]) -> MagicMock:
@@ -141,6 +189,7 @@ class TestBrowserManager:
         mock_context.new_page = AsyncMock(return_value=mock_page)
         mock_context.cookies = AsyncMock(return_value=[])
         mock_context.add_cookies = AsyncMock()
+        mock_context.add_init_script = AsyncMock()
         mock_context.close = AsyncMock()
 
         mock_browser = MagicMock()
@@ -166,9 +215,166 @@ class TestBrowserManager:
 
             page = await bm.start()
             assert page is mock_page
+            assert bm._page_alive is True
+
+            # Событие "close" сбрасывает флаг живости страницы
+            event, handler = mock_page.on.call_args.args
+            assert event == "close"
+            handler(mock_page)
+            assert bm._page_alive is False
 
         await bm.close()
 
+    @pytest.mark.asyncio
+    async def test_block_resources_disabled_by_default(self):
+        """Пустой blocked_resource_types — route не регистрируется (HTTP-кэш цел)."""
+        bm = BrowserManager()
+        context = MagicMock()
+        context.route = AsyncMock()
+
+        with patch("src.scraper.browser.settings") as mock_settings:
+            mock_settings.blocked_resource_types_set = frozenset()
+            mock_settings.blocked_hosts_list = ()
+            await bm._block_resources(context)
+
+        context.route.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_block_resources_aborts_third_party_only(self):
+        """Блокируются только указанные типы ресурсов со сторонних доменов."""
+        bm = BrowserManager()
+        context = MagicMock()
+        context.route = AsyncMock()
+
+        with patch("src.scraper.browser.settings") as mock_settings:
+            mock_settings.blocked_resource_types_set = frozenset({"image", "font"})
+            mock_settings.blocked_hosts_list = ()
+            mock_settings.avtor24_base_url = "https://avtor24.ru"
+            await bm._block_resources(context)
+
+        handler = context.route.await_args.args[1]
+
+        def make_route(url, resource_type):
+            route = MagicMock()
+            route.request.url = url
+            route.request.resource_type = resource_type
+            route.abort = AsyncMock()
+            route.continue_ = AsyncMock()
+            return route
+
+        third_party_img = make_route("https://mc.yandex.ru/pixel.gif", "image")
+        own_img = make_route("https://static.avtor24.ru/logo.png", "image")
+        third_party_xhr = make_route("https://api.example.com/data", "xhr")
+        for route in (third_party_img, own_img, third_party_xhr):
+            await handler(route)
+
+        third_party_img.abort.assert_awaited_once()
+        own_img.continue_.assert_awaited_once()
+        third_party_xhr.continue_.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_block_resources_aborts_analytics_hosts(self):
+        """blocked_hosts: любой запрос к хосту аналитики обрывается, остальные идут."""
+        bm = BrowserManager()
+        context = MagicMock()
+        context.route = AsyncMock()
+
+        with patch("src.scraper.browser.settings") as mock_settings:
+            mock_settings.blocked_resource_types_set = frozenset()
+            mock_settings.blocked_hosts_list = ("mc.yandex", "google-analytics")
+            mock_settings.avtor24_base_url = "https://avtor24.ru"
+            await bm._block_resources(context)
+
+        handler = context.route.await_args.args[1]
+        metrika = MagicMock()
+        metrika.request.url = "https://mc.yandex.ru/watch/123"
+        metrika.request.resource_type = "xhr"
+        metrika.abort = AsyncMock()
+        api = MagicMock()
+        api.request.url = "https://avtor24.ru/api/orders"
+        api.request.resource_type = "xhr"
+        api.continue_ = AsyncMock()
+        await handler(metrika)
+        await handler(api)
+
+        metrika.abort.assert_awaited_once()
+        api.continue_.assert_awaited_once()
+
+    @staticmethod
+    def _order_page_manager():
+        """BrowserManager с мок-контекстом: new_page выдаёт новые вкладки."""
+        bm = BrowserManager()
+        bm._context = MagicMock()
+
+        def new_page():
+            page = MagicMock()
+            page.is_closed = MagicMock(return_value=False)
+            page.add_init_script = AsyncMock()
+            page.goto = AsyncMock()
+            page.close = AsyncMock()
+            return page
+
+        bm._context.new_page = AsyncMock(side_effect=lambda: new_page())
+        return bm
+
+    @pytest.mark.asyncio
+    async def test_order_page_navigates_and_closes(self):
+        """order_page(url): вкладка открыта на абсолютном URL и закрыта даже при ошибке."""
+        bm = self._order_page_manager()
+
+        with pytest.raises(RuntimeError):
+            async with bm.order_page("/order/getoneorder/5") as page:
+                raise RuntimeError("boom")
+
+        page.goto.assert_awaited_once()
+        assert page.goto.await_args.args[0].endswith("/order/getoneorder/5")
+        assert page.goto.await_args.args[0].startswith("http")
+        page.close.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_start_reuses_live_page_without_is_closed(self):
+        """Повторный start() не дёргает page.is_closed() — флаг из события close."""
+        bm = BrowserManager()
+        mock_page = MagicMock()
+        bm._page = mock_page
+        bm._page_alive = True
+
+        page = await bm.start()
+
+        assert page is mock_page
+        mock_page.is_closed.assert_not_called()
+
+
+class TestPlaywrightLazyStacks:
+    """Облегчённый сбор стека в модулях Playwright."""
+
+    def test_playwright_modules_patched(self):
+        """inspect.stack в _connection/_network — без чтения исходников."""
+        from playwright._impl import _connection, _network
+        from src.scraper.browser import _lazy_inspect_stack, _patch_playwright_stacks
+
+        assert _patch_playwright_stacks() in (True, False)  # повторный вызов безопасен
+        assert _connection.inspect.stack is _lazy_inspect_stack
+        assert _network.inspect.stack is _lazy_inspect_stack
+
+        def caller():
+            return _connection.inspect.stack()
+
+        frames = caller()
+        assert frames[0].function == "caller"
+        assert frames[0].code_context is None
+
+    def test_lazy_extract_stack_keeps_frames(self):
+        """extract_stack без linecache: кадры на месте, строки читаются лениво."""
+        from src.scraper.browser import _lazy_extract_stack
+
+        def caller():
+            return _lazy_extract_stack()
+
+        stack = caller()
+        assert stack[-1].name == "caller"
+        assert "_lazy_extract_stack()" in stack[-1].line
+
 
 # ===== Тесты парсинга ленты заказов =====
 
@@ -269,9 +475,40 @@ class TestOrderListParsing:
             },
         ]
 
-        page.evaluate = AsyncMock(return_value=raw_orders)
+        # waitOrderCards возвращает JSON-строку {cards, lastPage}
+        page.evaluate = AsyncMock(return_value=json.dumps({"cards": raw_orders, "lastPage": 3}))
         return page
 
+    @pytest.mark.asyncio
+    async def test_parse_order_cards_calls_registered_helper(self):
+        """Экстрактор карточек вызывается по имени из init-скрипта, без передачи исходника."""
+        page = self._build_order_list_page()
+        await parse_order_cards(page)
+        expression = page.evaluate.await_args.args[0]
+        assert "window.__a24.waitOrderCards" in expression
+        assert "querySelectorAll" not in expression
+
+    @pytest.mark.asyncio
+    async def test_parse_order_cards_waits_in_same_evaluate(self):
+        """Ожидание карточек и извлечение — один evaluate; не дождались — пустой список."""
+        page = self._build_order_list_page()
+        page.evaluate = AsyncMock(return_value="")
+        orders = await parse_order_cards(page)
+        assert orders == []
+        page.evaluate.assert_awaited_once()
+        page.wait_for_selector.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_list_and_pagination_single_evaluate(self):
+        """Карточки и номера страниц пагинации — из одного evaluate."""
+        from src.scraper.orders import _parse_list_and_pagination
+
+        page = self._build_order_list_page()
+        orders, total_pages = await _parse_list_and_pagination(page)
+        assert len(orders) == 5
+        assert total_pages == 3
+        page.evaluate.assert_awaited_once()
+
     @pytest.mark.asyncio
     async def test_parse_order_list_count(self):
         """Парсинг возвращает 5 заказов."""
@@ -351,9 +588,10 @@ class TestOrderDetailParsing:
         """
         page = MagicMock()
         page.goto = AsyncMock()
-        page.wait_for_selector = AsyncMock()
+        page.wait_for_function = AsyncMock()
 
         raw_detail = {
+            "loaded": True,
             "title": "Курсовая по экономике предприятия",
             "fields": {
                 "Тип работы": "Курсовая работа",
@@ -387,45 +625,35 @@ class TestOrderDetailParsing:
     async def test_detail_title(self):
         """Заголовок парсится."""
         page = self._build_detail_page()
-        with patch("src.scraper.order_detail.browser_manager") as bm:
-            bm.short_delay = AsyncMock()
-            detail = await fetch_order_detail(page, "https://avtor24.ru/order/10001")
+        detail = await fetch_order_detail(page, "https://avtor24.ru/order/10001")
         assert detail.title == "Курсовая по экономике предприятия"
 
     @pytest.mark.asyncio
     async def test_detail_order_id(self):
         """order_id извлекается из URL."""
         page = self._build_detail_page()
-        with patch("src.scraper.order_detail.browser_manager") as bm:
-            bm.short_delay = AsyncMock()
-            detail = await fetch_order_detail(page, "https://avtor24.ru/order/10001")
+        detail = await fetch_order_detail(page, "https://avtor24.ru/order/10001")
         assert detail.order_id == "10001"
 
     @pytest.mark.asyncio
     async def test_detail_work_type(self):
         """Тип работы парсится."""
         page = self._build_detail_page()
-        with patch("src.scraper.order_detail.browser_manager") as bm:
-            bm.short_delay = AsyncMock()
-            detail = await fetch_order_detail(page, "https://avtor24.ru/order/10001")
+        detail = await fetch_order_detail(page, "https://avtor24.ru/order/10001")
         assert detail.work_type == "Курсовая работа"
 
     @pytest.mark.asyncio
     async def test_detail_subject(self):
         """Предмет парсится."""
         page = self._build_detail_page()
-        with patch("src.scraper.order_detail.browser_manager") as bm:
-            bm.short_delay = AsyncMock()
-            detail = await fetch_order_detail(page, "https://avtor24.ru/order/10001")
+        detail = await fetch_order_detail(page, "https://avtor24.ru/order/10001")
         assert detail.subject == "Экономика предприятия"
 
     @pytest.mark.asyncio
     async def test_detail_pages(self):
         """Количество страниц парсится."""
         page = self._build_detail_page()
-        with patch("src.scraper.order_detail.browser_manager") as bm:
-            bm.short_delay = AsyncMock()
-            detail = await fetch_order_detail(page, "https://avtor24.ru/order/10001")
+        detail = await fetch_order_detail(page, "https://avtor24.ru/order/10001")
         assert detail.pages_min == 25
         assert detail.pages_max == 30
 
@@ -433,9 +661,7 @@ class TestOrderDetailParsing:
     async def test_detail_uniqueness(self):
         """Требуемая уникальность парсится."""
         page = self._build_detail_page()
-        with patch("src.scraper.order_detail.browser_manager") as bm:
-            bm.short_delay = AsyncMock()
-            detail = await fetch_order_detail(page, "https://avtor24.ru/order/10001")
+        detail = await fetch_order_detail(page, "https://avtor24.ru/order/10001")
         assert detail.required_uniqueness == 60
         assert detail.antiplagiat_system == "ETXT Антиплагиат"
 
@@ -443,27 +669,21 @@ class TestOrderDetailParsing:
     async def test_detail_budget(self):
         """Бюджет парсится."""
         page = self._build_detail_page()
-        with patch("src.scraper.order_detail.browser_manager") as bm:
-            bm.short_delay = AsyncMock()
-            detail = await fetch_order_detail(page, "https://avtor24.ru/order/10001")
+        detail = await fetch_order_detail(page, "https://avtor24.ru/order/10001")
         assert detail.budget_rub == 3000
 
     @pytest.mark.asyncio
     async def test_detail_average_bid(self):
         """Средняя ставка парсится."""
         page = self._build_detail_page()
-        with patch("src.scraper.order_detail.browser_manager") as bm:
-            bm.short_delay = AsyncMock()
-            detail = await fetch_order_detail(page, "https://avtor24.ru/order/10001")
+        detail = await fetch_order_detail(page, "https://avtor24.ru/order/10001")
         assert detail.average_bid == 2800
 
     @pytest.mark.asyncio
     async def test_detail_files(self):
         """Прикреплённые файлы парсятся."""
         page = self._build_detail_page()
-        with patch("src.scraper.order_detail.browser_manager") as bm:
-            bm.short_delay = AsyncMock()
-            detail = await fetch_order_detail(page, "https://avtor24.ru/order/10001")
+        detail = await fetch_order_detail(page, "https://avtor24.ru/order/10001")
         assert len(detail.file_urls) == 2
         assert "55001" in detail.file_urls[0]
         assert "55002" in detail.file_urls[1]
@@ -472,38 +692,373 @@ class TestOrderDetailParsing:
     async def test_detail_customer_info(self):
         """Информация о заказчике парсится."""
         page = self._build_detail_page()
-        with patch("src.scraper.order_detail.browser_manager") as bm:
-            bm.short_delay = AsyncMock()
-            detail = await fetch_order_detail(page, "https://avtor24.ru/order/10001")
+        detail = await fetch_order_detail(page, "https://avtor24.ru/order/10001")
         assert "Иван" in detail.customer_name
 
     @pytest.mark.asyncio
     async def test_detail_description(self):
         """Описание парсится."""
         page = self._build_detail_page()
-        with patch("src.scraper.order_detail.browser_manager") as bm:
-            bm.short_delay = AsyncMock()
-            detail = await fetch_order_detail(page, "https://avtor24.ru/order/10001")
+        detail = await fetch_order_detail(page, "https://avtor24.ru/order/10001")
         assert "курсовую работу" in detail.description
 
     @pytest.mark.asyncio
     async def test_detail_font_size(self):
         """Размер шрифта парсится."""
         page = self._build_detail_page()
-        with patch("src.scraper.order_detail.browser_manager") as bm:
-            bm.short_delay = AsyncMock()
-            detail = await fetch_order_detail(page, "https://avtor24.ru/order/10001")
+        detail = await fetch_order_detail(page, "https://avtor24.ru/order/10001")
         assert detail.font_size == 14
 
     @pytest.mark.asyncio
     async def test_detail_line_spacing(self):
         """Межстрочный интервал парсится."""
         page = self._build_detail_page()
-        with patch("src.scraper.order_detail.browser_manager") as bm:
-            bm.short_delay = AsyncMock()
-            detail = await fetch_order_detail(page, "https://avtor24.ru/order/10001")
+        detail = await fetch_order_detail(page, "https://avtor24.ru/order/10001")
         assert detail.line_spacing == 1.5
 
+    @pytest.mark.asyncio
+    async def test_detail_waits_for_markup_not_delay(self):
+        """Навигация до commit, готовность — по селектору, без short_delay."""
+        page = self._build_detail_page()
+        await fetch_order_detail(page, "https://avtor24.ru/order/10001")
+        assert page.goto.await_args.kwargs["wait_until"] == "commit"
+        # Ждём именно поля, которые читает извлечение, — в том же evaluate
+        page.evaluate.assert_awaited_once()
+        assert any("FieldStyled" in s for s in page.evaluate.await_args.args[1])
+        # Экстрактор — из init-скрипта, по имени, без передачи исходника
+        expression = page.evaluate.await_args.args[0]
+        assert "window.__a24.extractOrderDetail" in expression
+        assert "querySelectorAll" not in expression
+        page.wait_for_function.assert_not_awaited()
+
+    def test_order_dataclasses_use_slots(self):
+        """OrderSummary/OrderDetail без __dict__, списки по умолчанию не общие."""
+        a = OrderDetail(order_id="1", title="", url="")
+        b = OrderDetail(order_id="2", title="", url="")
+        s = OrderSummary(order_id="1", title="", url="")
+        assert not hasattr(a, "__dict__")
+        assert not hasattr(s, "__dict__")
+        assert a.file_urls is not b.file_urls
+
+    @pytest.mark.asyncio
+    async def test_detail_order_id_from_getoneorder_url(self):
+        """order_id извлекается и из /order/getoneorder/{id}."""
+        page = self._build_detail_page()
+        detail = await fetch_order_detail(page, "/order/getoneorder/10002")
+        assert detail.order_id == "10002"
+
+    @pytest.mark.asyncio
+    async def test_detail_cached_within_ttl(self):
+        """Повторный разбор того же заказа — из кэша, без навигации."""
+        page = self._build_detail_page()
+        first = await fetch_order_detail(page, "https://avtor24.ru/order/getoneorder/10001")
+        second = await fetch_order_detail(page, "/order/getoneorder/10001")
+        assert second == first
+        page.goto.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_detail_cache_returns_copies(self):
+        """Изменение возвращённой детали (field_extractor) не портит кэш."""
+        page = self._build_detail_page()
+        first = await fetch_order_detail(page, "/order/getoneorder/10001")
+        first.structure = "из файлов"
+        second = await fetch_order_detail(page, "/order/getoneorder/10001")
+        assert second is not first
+        assert second.structure == ""
+
+    @pytest.mark.asyncio
+    async def test_detail_not_cached_when_render_timed_out(self):
+        """Разметка не дождалась (loaded=False) — неполная деталь не кэшируется."""
+        page = self._build_detail_page()
+        page.evaluate.return_value["loaded"] = False
+        await fetch_order_detail(page, "/order/getoneorder/10001")
+        await fetch_order_detail(page, "/order/getoneorder/10001")
+        assert page.goto.await_count == 2
+        assert "10001" not in _detail_cache
+
+    @pytest.mark.asyncio
+    async def test_detail_force_refresh_bypasses_cache(self):
+        """force_refresh=True перечитывает страницу."""
+        page = self._build_detail_page()
+        await fetch_order_detail(page, "https://avtor24.ru/order/getoneorder/10001")
+        await fetch_order_detail(
+            page, "https://avtor24.ru/order/getoneorder/10001", force_refresh=True,
+        )
+        assert page.goto.await_count == 2
+
+
+class TestCategoryFields:
+    """Тесты полей, доступных по категории типа работы."""
+
+    def test_writing_fields_are_frozenset(self):
+        """Письменные работы: страницы и оформление, множество неизменяемое."""
+        fields = get_category_fields("Курсовая работа")
+        assert isinstance(fields, frozenset)
+        assert {"pages", "font_size", "line_spacing"} <= fields
+
+    def test_unknown_type_budget_only(self):
+        """Неизвестный тип — категория other, только бюджет."""
+        assert get_category_fields("Что-то новое") == frozenset({"budget"})
+
+
+class TestFetchOrderListPool:
+    """Параллельный обход страниц ленты в fetch_order_list()."""
+
+    @staticmethod
+    def _first_page():
+        page = MagicMock()
+        page.goto = AsyncMock()
+        page.wait_for_selector = AsyncMock()
+        page.evaluate = AsyncMock()
+        return page
+
+    @staticmethod
+    def _summary(n):
+        return OrderSummary(order_id=str(n), title="", url=f"/order/getoneorder/{n}")
+
+    @pytest.mark.asyncio
+    async def test_pages_split_across_tabs_in_order(self):
+        """Страницы 2..N делятся между вкладками, результат — по порядку страниц."""
+        from src.scraper import orders
+
+        page = self._first_page()
+        first = AsyncMock(return_value=([self._summary(1)], 5))
+        extra_tab = MagicMock(name="extra")
+        used: dict[int, object] = {}
+
+        @asynccontextmanager
+        async def order_page(url=None):
+            yield extra_tab
+
+        async def parse_page(tab, n, try_http=True):
+            used[n] = tab
+            await asyncio.sleep(0.001 * (6 - n))  # поздние страницы отвечают раньше
+            return [self._summary(n)], False
+
+        with patch("src.scraper.orders.browser_manager") as bm, \
+             patch("src.scraper.orders._parse_list_and_pagination", first), \
+             patch("src.scraper.orders._parse_list_page", side_effect=parse_page):
+            bm.order_page = MagicMock(side_effect=order_page)
+            result = await orders.fetch_order_list(page, max_pages=5)
+
+        assert [o.order_id for o in result] == ["1", "2", "3", "4", "5"]
+        assert used == {2: page, 3: extra_tab, 4: page, 5: extra_tab}
+        # Пагинация пришла вместе с карточками — без отдельного evaluate
+        page.evaluate.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_empty_page_stops_later_pages(self):
+        """Пустая страница отсекает всё после неё."""
+        from src.scraper import orders
+
+        page = self._first_page()
+        first = AsyncMock(return_value=([self._summary(1)], 6))
+
+        @asynccontextmanager
+        async def order_page(url=None):
+            yield MagicMock()
+
+        async def parse_page(tab, n, try_http=True):
+            return ([] if n == 3 else [self._summary(n)]), False
+
+        with patch("src.scraper.orders.browser_manager") as bm, \
+             patch("src.scraper.orders._parse_list_and_pagination", first), \
+             patch("src.scraper.orders._parse_list_page", side_effect=parse_page):
+            bm.order_page = MagicMock(side_effect=order_page)
+            result = await orders.fetch_order_list(page, max_pages=6)
+
+        assert [o.order_id for o in result] == ["1", "2"]
+
+    @pytest.mark.asyncio
+    async def test_http_parse_skipped_after_render_only_page(self):
+        """Карточек в HTML не было — следующие страницы обхода сразу через goto."""
+        from src.scraper import orders
+
+        page = self._first_page()
+        first = AsyncMock(return_value=([self._summary(1)], 4))
+        http_flags: dict[int, bool] = {}
+
+        async def parse_page(tab, n, try_http=True):
+            http_flags[n] = try_http
+            return [self._summary(n)], False
+
+        with patch("src.scraper.orders.LIST_CONCURRENCY", 1), \
+             patch("src.scraper.orders._parse_list_and_pagination", first), \
+             patch("src.scraper.orders._parse_list_page", side_effect=parse_page):
+            result = await orders.fetch_order_list(page, max_pages=4)
+
+        assert [o.order_id for o in result] == ["1", "2", "3", "4"]
+        assert http_flags == {2: True, 3: False, 4: False}
+
+    @pytest.mark.asyncio
+    async def test_iter_order_list_streams_pages_on_own_tabs(self):
+        """iter_order_list: первая страница сразу, 2..N по порядку и не на вкладке вызывающего."""
+        from src.scraper import orders
+
+        page = self._first_page()
+        used: dict[int, object] = {}
+
+        @asynccontextmanager
+        async def order_page(url=None):
+            yield MagicMock(name="tab")
+
+        async def parse_page(tab, n, try_http=True):
+            used[n] = tab
+            await asyncio.sleep(0.001 * (5 - n))
+            return [self._summary(n)], False
+
+        first = AsyncMock(return_value=([self._summary(1)], 4))
+        with patch("src.scraper.orders.browser_manager") as bm, \
+             patch("src.scraper.orders._parse_list_and_pagination", first), \
+             patch("src.scraper.orders._parse_list_page", side_effect=parse_page):
+            bm.order_page = MagicMock(side_effect=order_page)
+            result = [o.order_id async for o in orders.iter_order_list(page, max_pages=4)]
+
+        assert result == ["1", "2", "3", "4"]
+        assert page not in used.values()
+
+    @pytest.mark.asyncio
+    async def test_first_page_retried_after_transient_failure(self):
+        """Сбой первой страницы не обрывает цикл: повтор с паузой, затем заказы."""
+        from src.scraper import orders
+
+        page = self._first_page()
+        page.goto = AsyncMock(side_effect=[TimeoutError("net"), None])
+        first = AsyncMock(return_value=([self._summary(1)], 1))
+
+        with patch("src.scraper.orders._parse_list_and_pagination", first), \
+             patch("src.scraper.orders.asyncio.sleep", new_callable=AsyncMock) as sleep:
+            result = [o.order_id async for o in orders.iter_order_list(page)]
+
+        assert result == ["1"]
+        assert page.goto.await_count == 2
+        sleep.assert_awaited_once_with(5)
+
+    @pytest.mark.asyncio
+    async def test_first_page_gives_up_after_attempts(self):
+        """Все попытки первой страницы неудачны — пустая лента, без исключения."""
+        from src.scraper import orders
+
+        page = self._first_page()
+        page.goto = AsyncMock(side_effect=TimeoutError("net"))
+
+        with patch("src.scraper.orders.asyncio.sleep", new_callable=AsyncMock):
+            result = [o async for o in orders.iter_order_list(page)]
+
+        assert result == []
+        assert page.goto.await_count == orders.FIRST_PAGE_ATTEMPTS
+
+    @pytest.mark.asyncio
+    async def test_iter_order_list_aclose_stops_workers(self):
+        """Прерванный перебор: aclose() снимает воркеры недогруженных страниц."""
+        from src.scraper import orders
+
+        page = self._first_page()
+        never = asyncio.Event()
+        cancelled = []
+
+        @asynccontextmanager
+        async def order_page(url=None):
+            yield MagicMock()
+
+        async def parse_page(tab, n, try_http=True):
+            try:
+                await never.wait()
+            except asyncio.CancelledError:
+                cancelled.append(n)
+                raise
+
+        first = AsyncMock(return_value=([self._summary(1)], 3))
+        with patch("src.scraper.orders.browser_manager") as bm, \
+             patch("src.scraper.orders._parse_list_and_pagination", first), \
+             patch("src.scraper.orders._parse_list_page", side_effect=parse_page):
+            bm.order_page = MagicMock(side_effect=order_page)
+            stream = orders.iter_order_list(page, max_pages=3)
+            assert (await stream.__anext__()).order_id == "1"
+            await asyncio.sleep(0.01)  # воркеры страниц 2..3 успели начать
+            await stream.aclose()
+
+        assert sorted(cancelled) == [2, 3]
+
+    @staticmethod
+    def _card(order_id):
+        return {
+            "orderId": order_id, "title": "Эссе", "url": f"/order/getoneorder/{order_id}",
+            "workType": "Эссе", "subject": "", "deadline": "", "budget": "1 000 ₽",
+            "bidCount": 0, "filesInfo": "", "customerName": "", "customerOnline": "",
+            "badges": [], "description": "", "creationTime": "",
+        }
+
+    @pytest.mark.asyncio
+    async def test_list_page_parsed_from_http_html(self):
+        """Карточки есть в HTML — без goto, разбор DOMParser'ом в странице."""
+        from src.scraper.orders import _parse_list_page
+
+        resp = MagicMock(ok=True)
+        resp.text = AsyncMock(return_value="<div class='auctionOrder'></div>")
+        resp.dispose = AsyncMock()
+        page = MagicMock()
+        page.goto = AsyncMock()
+        page.context.request.get = AsyncMock(return_value=resp)
+        page.evaluate = AsyncMock(return_value=json.dumps([self._card("7")]))
+
+        with patch("src.scraper.orders.browser_manager") as bm:
+            bm.random_delay = AsyncMock()
+            orders, from_http = await _parse_list_page(page, 2)
+
+        assert from_http is True
+        assert [o.order_id for o in orders] == ["7"]
+        assert orders[0].budget_rub == 1000
+        assert "parseOrderCards" in page.evaluate.await_args.args[0]
+        page.goto.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_list_page_without_http_goes_straight_to_render(self):
+        """try_http=False — без HTTP-запроса, сразу goto."""
+        from src.scraper.orders import _parse_list_page
+
+        page = MagicMock()
+        page.goto = AsyncMock()
+        page.context.request.get = AsyncMock()
+        page.evaluate = AsyncMock(return_value=json.dumps({"cards": [self._card("9")], "lastPage": 1}))
+
+        with patch("src.scraper.orders.browser_manager") as bm:
+            bm.random_delay = AsyncMock()
+            orders, from_http = await _parse_list_page(page, 4, try_http=False)
+
+        assert [o.order_id for o in orders] == ["9"]
+        assert from_http is False
+        page.context.request.get.assert_not_awaited()
+        page.goto.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_list_page_falls_back_to_render(self):
+        """В HTML карточек нет (рисует React) — goto и разбор отрисованного DOM."""
+        from src.scraper.orders import _parse_list_page
+
+        resp = MagicMock(ok=True)
+        resp.text = AsyncMock(return_value="<div id='root'></div>")
+        resp.dispose = AsyncMock()
+        page = MagicMock()
+        page.goto = AsyncMock()
+        page.wait_for_selector = AsyncMock()
+        page.context.request.get = AsyncMock(return_value=resp)
+        page.evaluate = AsyncMock(side_effect=[
+            "[]", json.dumps({"cards": [self._card("8")], "lastPage": 3}),
+        ])
+
+        with patch("src.scraper.orders.browser_manager") as bm:
+            bm.random_delay = AsyncMock()
+            orders, from_http = await _parse_list_page(page, 3)
+
+        assert from_http is False
+        assert [o.order_id for o in orders] == ["8"]
+        page.goto.assert_awaited_once()
+        page.wait_for_selector.assert_not_awaited()
+        assert page.goto.await_args.args[0].endswith("?page=3")
+        # Готовность — по карточкам, навигация только до коммита
+        assert page.goto.await_args.kwargs["wait_until"] == "commit"
+
 
 # ===== Тесты постановки ставок =====
 
@@ -646,13 +1201,13 @@ class TestChat:
         page.url = "https://avtor24.ru/order/getoneorder/10001"
         page.goto = AsyncMock()
 
-        # get_messages uses page.evaluate() returning list of dicts
+        # get_messages: page.evaluate() возвращает JSON-строку с сообщениями «столбцами»
         js_result = [
             {"text": "Здравствуйте! Сможете сделать?", "isSystem": False, "isOutgoing": False, "timestamp": "10:30"},
             {"text": "Да, тема знакомая, сделаю в срок.", "isSystem": False, "isOutgoing": True, "timestamp": "10:45"},
             {"text": "Методичку прикрепила, посмотрите.", "isSystem": False, "isOutgoing": False, "timestamp": "11:00"},
         ]
-        page.evaluate = AsyncMock(return_value=js_result)
+        page.evaluate = AsyncMock(return_value=json.dumps(_packed_messages(js_result)))
 
         # _ensure_chat_tab needs locator
         chat_tab = MagicMock()
@@ -666,6 +1221,22 @@ class TestChat:
         assert messages[1].is_incoming is False
         assert "Сможете сделать" in messages[0].text
 
+    @pytest.mark.asyncio
+    async def test_get_messages_single_round_trip(self):
+        """Клик по вкладке чата и извлечение — один evaluate, без sleep."""
+        page = MagicMock()
+        page.url = "https://avtor24.ru/order/getoneorder/10001"
+        page.evaluate = AsyncMock(return_value=_EMPTY_CHAT)
+        page.locator = MagicMock()
+
+        with patch("src.scraper.chat.asyncio.sleep", new_callable=AsyncMock) as sleep:
+            await get_messages(page, "10001")
+
+        page.evaluate.assert_awaited_once()
+        assert "window.__a24.extractMessages" in page.evaluate.await_args.args[0]
+        page.locator.assert_not_called()
+        sleep.assert_not_awaited()
+
     @pytest.mark.asyncio
     async def test_send_message_success(self):
         """Сообщение отправляется (textarea + JS send)."""
@@ -696,9 +1267,164 @@ class TestChat:
         result = await send_message(page, "10001", "Работа готова!")
 
         assert result is True
-        textarea.first.fill.assert_awaited_once_with("")
+        # Очистка поля — в том же evaluate, что и фокус, без fill("")
+        assert any("focusTextarea" in c.args[0] for c in page.evaluate.await_args_list)
+        textarea.first.fill.assert_not_awaited()
         textarea.first.type.assert_awaited_once()
 
+    @pytest.mark.asyncio
+    async def test_send_message_without_typing_single_evaluate(self):
+        """typing_delay_ms=0: вставка и отправка одним evaluate, без type()."""
+        page = MagicMock()
+        page.url = "https://avtor24.ru/order/getoneorder/10001"
+        page.evaluate = AsyncMock(side_effect=[False, 1])  # чат не дождались; отправлено
+        page.locator = MagicMock()
+
+        with patch("src.scraper.chat.settings") as mock_settings, \
+             patch("src.scraper.chat.asyncio.sleep", new_callable=AsyncMock) as sleep:
+            mock_settings.typing_delay_ms = 0
+            result = await send_message(page, "10001", "Работа готова!")
+
+        assert result is True
+        # Вкладка чата: клик и ожидание поля ввода — один evaluate
+        tab_call = page.evaluate.await_args_list[0]
+        assert "openChatTab" in tab_call.args[0]
+        assert tab_call.args[1] == {"timeout": 5000, "needInput": True}
+        call = page.evaluate.await_args_list[1]
+        assert "fillAndSend" in call.args[0]
+        assert call.args[1] == "Работа готова!"
+        page.locator.assert_not_called()
+        sleep.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_send_message_types_only_first_message_of_order(self):
+        """typing_first_message_only: набор только в первом сообщении заказа."""
+        page = MagicMock()
+        page.url = "https://avtor24.ru/order/getoneorder/10001"
+        page.goto = AsyncMock()
+        page.evaluate = AsyncMock(return_value=True)
+        textarea = MagicMock()
+        textarea.first.fill = AsyncMock()
+        textarea.first.type = AsyncMock()
+        page.locator = MagicMock(return_value=textarea)
+
+        with patch("src.scraper.chat.settings") as mock_settings:
+            mock_settings.typing_delay_ms = 30
+            mock_settings.typing_first_message_only = True
+            assert await send_message(page, "10001", "Здравствуйте!") is True
+            assert await send_message(page, "10001", "Работа готова!") is True
+            assert await send_message(page, "10002", "Здравствуйте!") is True
+
+        assert textarea.first.type.await_count == 2  # 10001 (первое) и 10002
+        fill_calls = [c for c in page.evaluate.await_args_list if "fillAndSend" in c.args[0]]
+        assert [c.args[1] for c in fill_calls] == ["Работа готова!"]
+
+    @pytest.mark.asyncio
+    async def test_send_message_types_every_message_when_disabled(self):
+        """typing_first_message_only=False — набор в каждом сообщении."""
+        page = MagicMock()
+        page.url = "https://avtor24.ru/order/getoneorder/10001"
+        page.evaluate = AsyncMock(return_value=True)
+        textarea = MagicMock()
+        textarea.first.fill = AsyncMock()
+        textarea.first.type = AsyncMock()
+        page.locator = MagicMock(return_value=textarea)
+
+        with patch("src.scraper.chat.settings") as mock_settings:
+            mock_settings.typing_delay_ms = 30
+            mock_settings.typing_first_message_only = False
+            await send_message(page, "10001", "Раз")
+            await send_message(page, "10001", "Два")
+
+        assert textarea.first.type.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_send_message_without_typing_no_input(self):
+        """typing_delay_ms=0 и нет textarea — False."""
+        page = MagicMock()
+        page.url = "https://avtor24.ru/order/getoneorder/10001"
+        page.evaluate = AsyncMock(side_effect=[False, -1])
+
+        with patch("src.scraper.chat.settings") as mock_settings:
+            mock_settings.typing_delay_ms = 0
+            result = await send_message(page, "10001", "Тест")
+
+        assert result is False
+
+    @pytest.mark.asyncio
+    async def test_get_messages_cached_within_ttl(self):
+        """Повторный опрос заказа в пределах TTL не трогает страницу."""
+        page = MagicMock()
+        page.url = "https://avtor24.ru/order/getoneorder/10002"
+        page.evaluate = AsyncMock(return_value=json.dumps(_packed_messages([{"text": "Привет"}])))
+
+        first = await get_messages(page, "10002")
+        second = await get_messages(page, "10002")
+
+        assert [m.text for m in second] == ["Привет"]
+        assert first is not second
+        page.evaluate.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_order_page_info_returns_chat_messages(self):
+        """get_order_page_info отдаёт сообщения как ChatMessage."""
+        page = MagicMock()
+        page.url = "https://avtor24.ru/order/getoneorder/10004"
+        page.evaluate = AsyncMock(return_value=json.dumps({
+            "accepted": True, "hasConfirmBtn": False, "hasBidForm": False,
+            "hasChat": True, "pageText": "Вас выбрали автором",
+            "messages": _packed_messages([
+                {"text": "Вас выбрали автором", "isSystem": True},
+                {"text": "Файл во вложении", "isOutgoing": False,
+                 "hasFiles": True, "fileUrls": ["https://avtor24.ru/file/1"]},
+            ]),
+        }))
+
+        info = await get_order_page_info(page, "10004")
+
+        assert info["accepted"] is True
+        assert all(isinstance(m, ChatMessage) for m in info["messages"])
+        assert info["messages"][0].is_system and not info["messages"][0].is_incoming
+        assert info["messages"][1].file_urls == ["https://avtor24.ru/file/1"]
+
+    @pytest.mark.asyncio
+    async def test_get_messages_after_order_page_info_skips_evaluate(self):
+        """get_messages сразу после get_order_page_info берёт сообщения из кэша."""
+        page = MagicMock()
+        page.url = "https://avtor24.ru/order/getoneorder/10005"
+        page.evaluate = AsyncMock(return_value=json.dumps({
+            "accepted": False, "hasConfirmBtn": False, "hasBidForm": True,
+            "hasChat": True, "pageText": "", "messages": _packed_messages([{"text": "Привет"}]),
+        }))
+
+        with patch("src.scraper.chat.settings") as mock_settings:
+            mock_settings.chat_poll_ttl_s = 3.0
+            await get_order_page_info(page, "10005")
+            messages = await get_messages(page, "10005")
+
+        assert [m.text for m in messages] == ["Привет"]
+        page.evaluate.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_send_message_invalidates_messages_cache(self):
+        """После отправки история чата читается заново."""
+        page = MagicMock()
+        page.url = "https://avtor24.ru/order/getoneorder/10003"
+        page.evaluate = AsyncMock(side_effect=[
+            _EMPTY_CHAT,  # get_messages
+            True, 1,      # send_message: openChatTab, fillAndSend
+            _EMPTY_CHAT,  # get_messages после отправки
+        ])
+
+        with patch("src.scraper.chat.settings") as mock_settings:
+            mock_settings.typing_delay_ms = 0
+            mock_settings.chat_poll_ttl_s = 3.0
+            await get_messages(page, "10003")
+            assert await send_message(page, "10003", "Ок") is True
+            await get_messages(page, "10003")
+
+        assert page.evaluate.await_count == 4
+
     @pytest.mark.asyncio
     async def test_send_message_no_input(self):
         """Отправка не удаётся если нет textarea."""
@@ -722,38 +1448,114 @@ class TestChat:
         assert result is False
 
 
-# ===== Тесты парсинга активных заказов с /home =====
+class TestChatHelpers:
+    """Вызов JS-хелперов window.__a24 из init-скрипта."""
 
-class TestActiveOrdersParsing:
-    """Тесты get_accepted_order_ids / get_active_chats — парсинг вкладок на /home.
+    @pytest.mark.asyncio
+    async def test_call_helper_uses_short_expression(self):
+        """evaluate получает вызов по имени, а не исходник экстрактора."""
+        page = MagicMock()
+        page.evaluate = AsyncMock(return_value=["1"])
 
-    Новая логика: используем вкладки (tabs) на /home вместо поиска секций в DOM.
-    Контент рендерится вне #root — ищем по document.body.
-    """
+        result = await _call_helper(page, "extractOrderIds")
 
-    @staticmethod
-    def _make_home_page(order_ids: list[str], url="https://avtor24.ru/home"):
-        """Создать мок страницы /home.
+        assert result == ["1"]
+        expression = page.evaluate.await_args.args[0]
+        assert "window.__a24.extractOrderIds" in expression
+        assert len(expression) < 100
 
-        order_ids: список order_id, возвращаемых _extract_visible_order_ids.
-        evaluate вызывается 1 раз для get_accepted (только extraction)
-        или 2 раза для get_active_chats (tab click + extraction).
-        """
+    @pytest.mark.asyncio
+    async def test_call_helper_injects_when_missing(self):
+        """Если хелперов нет на странице — внедряем и повторяем вызов."""
         page = MagicMock()
-        page.url = url
-        page.goto = AsyncMock()
-        # Для get_accepted: 1 evaluate (extraction → order_ids)
-        # Для get_active_chats: 2 evaluates (tab click → True, extraction → order_ids)
-        page.evaluate = AsyncMock(side_effect=[True, order_ids])
-        return page
+        page.evaluate = AsyncMock(side_effect=[None, None, True])
+
+        result = await _call_helper(page, "clickHomeTab", "В работе")
+
+        assert result is True
+        assert page.evaluate.await_count == 3
+        assert "window.__a24 = {" in page.evaluate.await_args_list[1].args[0]
+
+
+class TestChatReadinessWaits:
+    """Ожидание готовности DOM вместо фиксированных sleep."""
+
+    @pytest.mark.asyncio
+    async def test_ensure_order_page_waits_for_selector(self):
+        """После навигации ждём React-маркер, а не sleep(5)."""
+        page = MagicMock()
+        page.url = "https://avtor24.ru/home"
+        page.goto = AsyncMock()
+        page.wait_for_selector = AsyncMock()
+
+        with patch("src.scraper.browser.asyncio.sleep", new_callable=AsyncMock) as sleep:
+            await ensure_order_page(page, "10001")
+
+        page.goto.assert_awaited_once()
+        page.wait_for_selector.assert_awaited_once()
+        sleep.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_send_message_typing_waits_for_send_button(self):
+        """После набора ждём активную кнопку отправки, без фиксированных пауз."""
+        page = MagicMock()
+        page.url = "https://avtor24.ru/order/getoneorder/10001"
+        page.evaluate = AsyncMock(return_value=True)
+        page.wait_for_function = AsyncMock()
+        textarea = MagicMock()
+        textarea.first.fill = AsyncMock()
+        textarea.first.type = AsyncMock()
+        page.locator = MagicMock(return_value=textarea)
+
+        with patch("src.scraper.chat.asyncio.sleep", new_callable=AsyncMock) as sleep:
+            assert await send_message(page, "10001", "Текст") is True
+
+        sleep.assert_not_awaited()
+        expressions = [c.args[0] for c in page.wait_for_function.await_args_list]
+        assert any("disabled" in e for e in expressions)
+
+    @pytest.mark.asyncio
+    async def test_confirm_order_waits_for_buttons_not_sleep(self):
+        """confirm_order ждёт отрисовки кнопок вместо sleep(2)."""
+        page = MagicMock()
+        page.url = "https://avtor24.ru/order/getoneorder/10001"
+        page.evaluate = AsyncMock(side_effect=[0, 0])
+        page.wait_for_selector = AsyncMock()
+        overlay = MagicMock()
+        overlay.count = AsyncMock(return_value=0)
+        page.locator = MagicMock(return_value=overlay)
+
+        with patch("src.scraper.chat.asyncio.sleep", new_callable=AsyncMock) as sleep:
+            assert await confirm_order(page, "10001") is True
+
+        sleep.assert_not_awaited()
+        assert page.wait_for_selector.await_args_list[0].args[0] == "#root button"
+
+    @pytest.mark.asyncio
+    async def test_wait_for_selector_timeout_returns_false(self):
+        """Таймаут ожидания не пробрасывается наружу."""
+        page = MagicMock()
+        page.wait_for_selector = AsyncMock(side_effect=Exception("Timeout 5000ms exceeded"))
+
+        assert await wait_for_selector(page, "textarea") is False
+
+
+# ===== Тесты парсинга активных заказов с /home =====
+
+class TestActiveOrdersParsing:
+    """Тесты get_accepted_order_ids / get_active_chats — парсинг вкладок на /home.
+
+    Новая логика: используем вкладки (tabs) на /home вместо поиска секций в DOM.
+    Контент рендерится вне #root — ищем по document.body.
+    """
 
     @staticmethod
     def _make_accepted_page(order_ids: list[str], url="https://avtor24.ru/home"):
-        """Мок для get_accepted_order_ids (1 evaluate = extraction only)."""
+        """Мок /home для «Активных чатов» (1 evaluate = extraction only)."""
         page = MagicMock()
         page.url = url
         page.goto = AsyncMock()
-        page.evaluate = AsyncMock(return_value=order_ids)
+        page.evaluate = AsyncMock(return_value=_order_hrefs(order_ids))
         return page
 
     @pytest.mark.asyncio
@@ -810,8 +1612,7 @@ class TestActiveOrdersParsing:
     @pytest.mark.asyncio
     async def test_get_active_chats_returns_ids(self):
         """get_active_chats возвращает order_id из вкладки «Активные чаты»."""
-        # get_active_chats: 2 evaluates (tab click → True, extraction → ids)
-        page = self._make_home_page(["11111", "22222", "33333"])
+        page = self._make_accepted_page(["11111", "22222", "33333"])
 
         with patch("src.scraper.chat.settings") as mock_settings:
             mock_settings.avtor24_base_url = "https://avtor24.ru"
@@ -822,7 +1623,7 @@ class TestActiveOrdersParsing:
     @pytest.mark.asyncio
     async def test_get_active_chats_empty(self):
         """get_active_chats возвращает [] если нет чатов."""
-        page = self._make_home_page([])
+        page = self._make_accepted_page([])
 
         with patch("src.scraper.chat.settings") as mock_settings:
             mock_settings.avtor24_base_url = "https://avtor24.ru"
@@ -843,6 +1644,69 @@ class TestActiveOrdersParsing:
 
         assert result == []
 
+    @pytest.mark.asyncio
+    async def test_accepted_and_active_share_one_home_read(self):
+        """get_accepted_order_ids + get_active_chats подряд — один goto и одно чтение вкладки."""
+        page = self._make_accepted_page(["12345", "67890"])
+
+        with patch("src.scraper.chat.settings") as mock_settings:
+            mock_settings.avtor24_base_url = "https://avtor24.ru"
+            accepted = await get_accepted_order_ids(page)
+            accepted.append("mutated")
+            active = await get_active_chats(page)
+
+        assert active == ["12345", "67890"]
+        page.goto.assert_awaited_once()
+        page.evaluate.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_active_ids_cache_reset_by_invalidate(self):
+        """invalidate_home_cache сбрасывает и кэш «Активных чатов»."""
+        page = self._make_accepted_page(["12345"])
+
+        with patch("src.scraper.chat.settings") as mock_settings:
+            mock_settings.avtor24_base_url = "https://avtor24.ru"
+            await get_accepted_order_ids(page)
+            invalidate_home_cache(page)
+            await get_active_chats(page)
+
+        assert page.goto.await_count == 2
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("action", [confirm_order, cancel_order])
+    async def test_confirm_and_cancel_reset_active_ids_cache(self, action):
+        """После confirm/cancel_order следующий get_accepted_order_ids в пределах TTL читает /home заново."""
+        page = MagicMock()
+        page.url = "https://avtor24.ru/order/getoneorder/222"
+        page.evaluate = AsyncMock(return_value=0)
+        page.wait_for_selector = AsyncMock()
+        page.locator.return_value.count = AsyncMock(return_value=0)
+        _active_ids_cache[id(page)] = (time.monotonic(), ["111"])
+
+        assert await action(page, "222") is True
+        with patch(
+            "src.scraper.chat._fetch_tab", new_callable=AsyncMock, return_value=["111", "222"],
+        ) as fetch:
+            accepted = await get_accepted_order_ids(page)
+
+        assert accepted == ["111", "222"]
+        fetch.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_login_redirect_not_cached(self):
+        """Редирект на логин не кэшируется — следующий вызов снова идёт на /home."""
+        page = MagicMock()
+        page.url = "https://avtor24.ru/login"
+        page.goto = AsyncMock(side_effect=Exception("ERR_ABORTED"))
+        page.evaluate = AsyncMock(return_value=True)
+
+        with patch("src.scraper.chat.settings") as mock_settings:
+            mock_settings.avtor24_base_url = "https://avtor24.ru"
+            assert await get_accepted_order_ids(page) == []
+            assert await get_active_chats(page) == []
+
+        assert page.goto.await_count == 2
+
     @pytest.mark.asyncio
     async def test_navigate_home_success(self):
         """_navigate_home возвращает True при успешной навигации."""
@@ -857,6 +1721,119 @@ class TestActiveOrdersParsing:
         assert result is True
         page.goto.assert_awaited_once()
 
+    @pytest.mark.asyncio
+    async def test_navigate_home_waits_for_content_not_fixed_sleep(self):
+        """После goto ждём разметку /home и networkidle, без sleep(5)."""
+        page = MagicMock()
+        page.url = "https://avtor24.ru/home"
+        page.goto = AsyncMock()
+        page.wait_for_selector = AsyncMock()
+        page.wait_for_load_state = AsyncMock()
+
+        with patch("src.scraper.chat.settings") as mock_settings, \
+             patch("src.scraper.chat.asyncio.sleep", new_callable=AsyncMock) as sleep:
+            mock_settings.avtor24_base_url = "https://avtor24.ru"
+            assert await _navigate_home(page) is True
+
+        assert "getoneorder" in page.wait_for_selector.await_args.args[0]
+        page.wait_for_load_state.assert_awaited_once_with("networkidle", timeout=5000)
+        assert all(c.args[0] < 1 for c in sleep.await_args_list)
+
+    @pytest.mark.asyncio
+    async def test_navigate_home_cached_within_ttl(self):
+        """Повторный вызов в пределах TTL не делает goto."""
+        page = MagicMock()
+        page.url = "https://avtor24.ru/home"
+        page.goto = AsyncMock()
+
+        with patch("src.scraper.chat.settings") as mock_settings, \
+             patch("src.scraper.chat.asyncio.sleep", new_callable=AsyncMock):
+            mock_settings.avtor24_base_url = "https://avtor24.ru"
+            assert await _navigate_home(page) is True
+            assert await _navigate_home(page) is True
+            page.goto.assert_awaited_once()
+
+            # После invalidate_home_cache — снова навигация
+            invalidate_home_cache(page)
+            assert await _navigate_home(page) is True
+
+        assert page.goto.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_navigate_home_cache_ignored_off_home(self):
+        """Кэш не срабатывает, если страница ушла с /home."""
+        page = MagicMock()
+        page.url = "https://avtor24.ru/home"
+        page.goto = AsyncMock()
+
+        with patch("src.scraper.chat.settings") as mock_settings, \
+             patch("src.scraper.chat.asyncio.sleep", new_callable=AsyncMock):
+            mock_settings.avtor24_base_url = "https://avtor24.ru"
+            await _navigate_home(page)
+            page.url = "https://avtor24.ru/order/getoneorder/1"
+            await _navigate_home(page)
+
+        assert page.goto.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_fetch_default_tab_reclicked_when_cached(self):
+        """Из кэша /home дефолтная вкладка кликается явно (могла быть открыта другая)."""
+        page = MagicMock()
+        page.url = "https://avtor24.ru/home"
+        page.goto = AsyncMock()
+        page.evaluate = AsyncMock(side_effect=[True, _order_hrefs(["1"]), True, _order_hrefs(["2"])])
+
+        with patch("src.scraper.chat.settings") as mock_settings, \
+             patch("src.scraper.chat.asyncio.sleep", new_callable=AsyncMock):
+            mock_settings.avtor24_base_url = "https://avtor24.ru"
+            assert await _fetch_tab(page, "В работе") == ["1"]
+            assert await _fetch_tab(page) == ["2"]
+
+        page.goto.assert_awaited_once()
+        assert page.evaluate.await_args_list[2].args[1] == "Активные чаты"
+
+    @pytest.mark.asyncio
+    async def test_navigate_home_concurrent_calls_share_one_goto(self):
+        """Параллельные _navigate_home на одной странице — одна навигация."""
+        page = MagicMock()
+        page.url = "https://avtor24.ru/home"
+
+        async def slow_goto(*args, **kwargs):
+            await asyncio.sleep(0.01)
+
+        page.goto = AsyncMock(side_effect=slow_goto)
+
+        with patch("src.scraper.chat.settings") as mock_settings:
+            mock_settings.avtor24_base_url = "https://avtor24.ru"
+            results = await asyncio.gather(*(_navigate_home(page) for _ in range(3)))
+
+        assert results == [True, True, True]
+        page.goto.assert_awaited_once()
+        assert not _home_nav_inflight
+
+    @pytest.mark.asyncio
+    async def test_navigate_home_inflight_error_reaches_all_callers(self):
+        """Ошибка общей навигации получают все ожидающие, следующий вызов идёт заново."""
+        page = MagicMock()
+        page.url = "https://avtor24.ru/home"
+
+        async def failing_goto(*args, **kwargs):
+            await asyncio.sleep(0.01)
+            raise Exception("Network timeout")
+
+        page.goto = AsyncMock(side_effect=failing_goto)
+
+        with patch("src.scraper.chat.settings") as mock_settings:
+            mock_settings.avtor24_base_url = "https://avtor24.ru"
+            results = await asyncio.gather(
+                _navigate_home(page), _navigate_home(page), return_exceptions=True,
+            )
+            assert all(isinstance(r, Exception) for r in results)
+            page.goto = AsyncMock()
+            assert await _navigate_home(page) is True
+
+        page.goto.assert_awaited_once()
+
     @pytest.mark.asyncio
     async def test_navigate_home_login_redirect(self):
         """_navigate_home возвращает False при редиректе на /login."""
@@ -897,11 +1874,35 @@ class TestActiveOrdersParsing:
     async def test_extract_visible_order_ids_returns_list(self):
         """_extract_visible_order_ids возвращает список строк."""
         page = MagicMock()
-        page.evaluate = AsyncMock(return_value=["70001", "70002"])
+        page.evaluate = AsyncMock(return_value=_order_hrefs(["70001", "70002"]))
 
         result = await _extract_visible_order_ids(page)
         assert result == ["70001", "70002"]
 
+    @pytest.mark.asyncio
+    async def test_extract_visible_order_ids_parses_hrefs(self):
+        """order_id извлекается из href в Python, дубли и мусор отбрасываются."""
+        page = MagicMock()
+        page.evaluate = AsyncMock(return_value="\n".join([
+            "https://avtor24.ru/order/getoneorder/70001",
+            "https://avtor24.ru/order/getoneorder/70001?tab=chat",
+            "https://avtor24.ru/order/getoneorder/",
+            "https://avtor24.ru/order/getoneorder/70002#files",
+        ]))
+
+        result = await _extract_visible_order_ids(page)
+
+        assert result == ["70001", "70002"]
+        assert "extractOrderHrefs" in page.evaluate.await_args.args[0]
+
+    @pytest.mark.asyncio
+    async def test_extract_visible_order_ids_empty(self):
+        """Пустая строка из JS — пустой список."""
+        page = MagicMock()
+        page.evaluate = AsyncMock(return_value="")
+
+        assert await _extract_visible_order_ids(page) == []
+
     @pytest.mark.asyncio
     async def test_click_home_tab_returns_true_on_success(self):
         """_click_home_tab возвращает True когда вкладка найдена и кликнута."""
@@ -921,6 +1922,424 @@ class TestActiveOrdersParsing:
         assert result is False
 
 
+class TestDownloadChatFiles:
+    """Параллельное скачивание файлов (file_handler.download_files)."""
+
+    @pytest.mark.asyncio
+    async def test_multiple_files_downloaded_on_separate_tabs(self, tmp_path):
+        """Каждый файл качается на своей вкладке, ошибка одного не мешает другим."""
+        from src.scraper.file_handler import download_files
+
+        page = MagicMock()
+        page.context.new_page = AsyncMock()
+        bm, tabs = self._tab_manager()
+        seen = []
+
+        async def fake_download_one(p, url, order_dir, idx):
+            seen.append(p)
+            if url == "u2":
+                raise Exception("boom")
+            return order_dir / url
+
+        with patch("src.scraper.file_handler.DOWNLOAD_DIR", tmp_path), \
+             patch("src.scraper.file_handler.browser_manager", bm), \
+             patch("src.scraper.file_handler._download_one", side_effect=fake_download_one):
+            result = await download_files(page, "1", ["u1", "u2", "u3"])
+
+        assert result == [tmp_path / "1" / "u1", tmp_path / "1" / "u3"]
+        assert page not in seen
+        # Вкладки — из browser_manager.order_page (с маскировкой), не context.new_page
+        assert sorted(seen, key=id) == sorted(tabs, key=id)
+        page.context.new_page.assert_not_called()
+
+    @staticmethod
+    def _tab_manager():
+        """Мок browser_manager: order_page() выдаёт новую вкладку-мок."""
+        tabs = []
+
+        @asynccontextmanager
+        async def order_page(url=None):
+            tab = MagicMock(name=f"tab{len(tabs)}")
+            tabs.append(tab)
+            yield tab
+
+        bm = MagicMock()
+        bm.order_page = order_page
+        return bm, tabs
+
+    @pytest.mark.asyncio
+    async def test_downloads_bounded_by_semaphore(self, tmp_path):
+        """Одновременно открыто не больше DOWNLOAD_CONCURRENCY вкладок."""
+        from src.scraper.file_handler import download_files
+
+        state = {"active": 0, "max": 0}
+
+        async def fake_download_one(p, url, order_dir, idx):
+            state["active"] += 1
+            state["max"] = max(state["max"], state["active"])
+            await asyncio.sleep(0.01)
+            state["active"] -= 1
+            return order_dir / url
+
+        page = MagicMock()
+        bm, _ = self._tab_manager()
+
+        with patch("src.scraper.file_handler.DOWNLOAD_DIR", tmp_path), \
+             patch("src.scraper.file_handler.browser_manager", bm), \
+             patch("src.scraper.file_handler.DOWNLOAD_CONCURRENCY", 2), \
+             patch("src.scraper.file_handler._download_one", side_effect=fake_download_one):
+            result = await download_files(page, "1", [f"u{i}" for i in range(5)])
+
+        assert len(result) == 5
+        assert state["max"] == 2
+
+    @pytest.mark.asyncio
+    async def test_single_file_uses_current_page(self, tmp_path):
+        """Один файл — без новых вкладок."""
+        from src.scraper.file_handler import download_files
+
+        page = MagicMock()
+        page.context.new_page = AsyncMock()
+
+        with patch("src.scraper.file_handler.DOWNLOAD_DIR", tmp_path), \
+             patch(
+                 "src.scraper.file_handler._download_one",
+                 new_callable=AsyncMock, return_value=tmp_path / "a.docx",
+             ) as dl:
+            result = await download_files(page, "1", ["u1"])
+
+        assert result == [tmp_path / "a.docx"]
+        assert dl.await_args.args[0] is page
+        page.context.new_page.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_download_chat_files_returns_str_paths(self):
+        """download_chat_files отдаёт пути строками."""
+        page = MagicMock()
+
+        with patch(
+            "src.scraper.file_handler.download_files",
+            new_callable=AsyncMock, return_value=[Path("/tmp/a.docx")],
+        ) as dl:
+            result = await download_chat_files(page, "1", ["u1", "u2"])
+
+        assert result == [str(Path("/tmp/a.docx"))]
+        dl.assert_awaited_once_with(page, "1", ["u1", "u2"])
+
+    @staticmethod
+    def _download_page(download):
+        """Мок страницы, у которой expect_download отдаёт download."""
+        info = MagicMock()
+        info.value = asyncio.sleep(0, result=download)
+        ctx = MagicMock()
+        ctx.__aenter__ = AsyncMock(return_value=info)
+        ctx.__aexit__ = AsyncMock(return_value=False)
+        page = MagicMock()
+        page.expect_download = MagicMock(return_value=ctx)
+        page.goto = AsyncMock()
+        return page
+
+    @pytest.mark.asyncio
+    async def test_download_moves_temp_file(self, tmp_path):
+        """Временный файл Playwright переносится, а не копируется save_as()."""
+        from src.scraper.file_handler import _download_one
+
+        temp = tmp_path / "pw-tmp"
+        temp.write_bytes(b"data")
+        download = MagicMock(suggested_filename="task.pdf")
+        download.path = AsyncMock(return_value=temp)
+        download.save_as = AsyncMock()
+
+        result = await _download_one(self._download_page(download), "u", tmp_path, 0)
+
+        assert result == tmp_path / "task.pdf"
+        assert result.read_bytes() == b"data"
+        assert not temp.exists()
+        download.save_as.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_download_falls_back_to_save_as(self, tmp_path):
+        """rename невозможен (другая ФС) — копия через save_as()."""
+        from src.scraper.file_handler import _download_one
+
+        download = MagicMock(suggested_filename="task.pdf")
+        download.path = AsyncMock(return_value=tmp_path / "pw-tmp")
+        download.save_as = AsyncMock()
+
+        with patch("src.scraper.file_handler.os.replace", side_effect=OSError(18, "EXDEV")):
+            await _download_one(self._download_page(download), "u", tmp_path, 0)
+
+        download.save_as.assert_awaited_once_with(str(tmp_path / "task.pdf"))
+
+    @staticmethod
+    def _api_response(content_type, body=b"", disposition=""):
+        """Мок APIResponse контекста."""
+        resp = MagicMock(ok=True)
+        resp.headers = {"content-type": content_type, "content-disposition": disposition}
+        resp.body = AsyncMock(return_value=body)
+        resp.dispose = AsyncMock()
+        return resp
+
+    @pytest.mark.asyncio
+    async def test_direct_request_skips_navigation(self, tmp_path):
+        """Файл отдан напрямую — запись из ответа, без вкладок и goto."""
+        from src.scraper.file_handler import download_files
+
+        page = MagicMock()
+        page.goto = AsyncMock()
+        page.context.new_page = AsyncMock()
+        page.context.request.get = AsyncMock(side_effect=[
+            self._api_response("application/pdf", b"%PDF", 'attachment; filename="a.pdf"'),
+            self._api_response("application/octet-stream", b"PK"),
+        ])
+
+        with patch("src.scraper.file_handler.DOWNLOAD_DIR", tmp_path):
+            result = await download_files(page, "1", ["/file/download/1", "/file/download/b.docx"])
+
+        assert result == [tmp_path / "1" / "a.pdf", tmp_path / "1" / "b.docx"]
+        assert (tmp_path / "1" / "a.pdf").read_bytes() == b"%PDF"
+        assert page.context.request.get.await_args_list[0].args[0].startswith("http")
+        page.goto.assert_not_awaited()
+        page.context.new_page.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_direct_download_adds_extension_from_content_type(self, tmp_path):
+        """URL /download/<id> без расширения — расширение из Content-Type, запись в потоке."""
+        from src.scraper.file_handler import download_files
+
+        page = MagicMock()
+        page.context.request.get = AsyncMock(return_value=self._api_response(
+            "application/pdf; charset=binary", b"%PDF",
+        ))
+
+        with patch("src.scraper.file_handler.DOWNLOAD_DIR", tmp_path), \
+             patch(
+                 "src.scraper.file_handler.asyncio.to_thread", wraps=asyncio.to_thread,
+             ) as to_thread:
+            result = await download_files(page, "1", ["/file/download/42"])
+
+        assert result == [tmp_path / "1" / "42.pdf"]
+        assert (tmp_path / "1" / "42.pdf").read_bytes() == b"%PDF"
+        to_thread.assert_called_once()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("content_type,url", [
+        ("application/json", "/file/download/task.docx"),
+        ("text/plain; charset=utf-8", "/file/download/42"),
+    ])
+    async def test_text_error_body_falls_back_to_navigation(self, tmp_path, content_type, url):
+        """2xx с JSON/текстом вместо документа не сохраняется — файл качается навигацией."""
+        from src.scraper.file_handler import download_files
+
+        page = MagicMock()
+        page.context.request.get = AsyncMock(return_value=self._api_response(
+            content_type, b'{"error": "unauthorized"}',
+        ))
+
+        with patch("src.scraper.file_handler.DOWNLOAD_DIR", tmp_path), \
+             patch(
+                 "src.scraper.file_handler._download_one",
+                 new_callable=AsyncMock, return_value=tmp_path / "1" / "task.docx",
+             ) as dl:
+            result = await download_files(page, "1", [url])
+
+        assert result == [tmp_path / "1" / "task.docx"]
+        dl.assert_awaited_once()
+        assert list((tmp_path / "1").iterdir()) == []
+
+    @pytest.mark.asyncio
+    async def test_plain_text_file_saved_directly(self, tmp_path):
+        """Текстовый файл с ожидаемым расширением — обычное прямое скачивание."""
+        from src.scraper.file_handler import download_files
+
+        page = MagicMock()
+        page.context.request.get = AsyncMock(return_value=self._api_response(
+            "text/plain", b"notes", 'attachment; filename="notes.txt"',
+        ))
+
+        with patch("src.scraper.file_handler.DOWNLOAD_DIR", tmp_path):
+            result = await download_files(page, "1", ["/file/download/7"])
+
+        assert result == [tmp_path / "1" / "notes.txt"]
+
+    def test_response_filename_keeps_known_or_unknown_extension(self):
+        """Расширение из имени не заменяется; octet-stream не даёт «.bin»."""
+        from src.scraper.file_handler import _response_filename
+
+        assert _response_filename("", "/d/b.docx", 0, "application/pdf") == "b.docx"
+        assert _response_filename("", "/d/42", 0, "application/octet-stream") == "42"
+        assert _response_filename("", "/d/42", 0) == "42"
+
+    @pytest.mark.asyncio
+    async def test_html_response_falls_back_to_navigation(self, tmp_path):
+        """Сервер отдал HTML — файл качается навигацией на текущей странице."""
+        from src.scraper.file_handler import download_files
+
+        page = MagicMock()
+        page.context.request.get = AsyncMock(return_value=self._api_response("text/html; charset=utf-8"))
+
+        with patch("src.scraper.file_handler.DOWNLOAD_DIR", tmp_path), \
+             patch(
+                 "src.scraper.file_handler._download_one",
+                 new_callable=AsyncMock, return_value=tmp_path / "a.docx",
+             ) as dl:
+            result = await download_files(page, "1", ["/order/file/1"])
+
+        assert result == [tmp_path / "a.docx"]
+        assert dl.await_args.args[0] is page
+
+
+class TestUploadFile:
+    """upload_file: переход на заказ через ожидание разметки, без фиксированных пауз."""
+
+    @pytest.mark.asyncio
+    async def test_navigates_and_waits_for_order_markup(self):
+        """Не на странице заказа — goto + ожидание разметки заказа, без sleep(5)."""
+        from src.scraper.file_handler import upload_file
+
+        page = MagicMock()
+        page.url = "https://avtor24.ru/home"
+        page.goto = AsyncMock()
+        page.wait_for_selector = AsyncMock()
+        page.keyboard.press = AsyncMock()
+        page.evaluate = AsyncMock(return_value=-1)  # clickButton: кнопки нет
+        page.locator.return_value.count = AsyncMock(return_value=0)  # оверлея нет
+
+        with patch("src.scraper.browser.settings") as mock_settings, \
+             patch("src.scraper.file_handler.asyncio.sleep", new_callable=AsyncMock) as sleep:
+            mock_settings.avtor24_base_url = "https://avtor24.ru"
+            ok = await upload_file(page, "555", Path("/tmp/work.docx"))
+
+        assert ok is False  # кнопки «Загрузить работу» нет
+        page.goto.assert_awaited_once()
+        assert "/order/getoneorder/555" in page.goto.await_args.args[0]
+        page.wait_for_selector.assert_awaited()
+        assert all(c.args[0] < 5 for c in sleep.await_args_list)
+        # Оверлея нет — ни Escape, ни ожидания его скрытия
+        page.locator.assert_called_once_with('[class*="Overlay"]')
+        page.keyboard.press.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_upload_waits_for_dom_conditions_not_sleeps(self):
+        """Успешная загрузка: ожидания по DOM-условиям, ни одного asyncio.sleep."""
+        from src.scraper.file_handler import upload_file, _UPLOAD_DONE, _UPLOAD_INPUT_READY
+
+        page = MagicMock()
+        page.url = "https://avtor24.ru/order/getoneorder/555"
+        page.keyboard.press = AsyncMock()
+        page.wait_for_selector = AsyncMock()
+        page.wait_for_function = AsyncMock()
+        page.evaluate = AsyncMock(side_effect=[
+            0,                                            # clickButton «Загрузить работу»
+            {"selected": True, "text": "Окончательный"},  # выбор варианта
+            1,                                            # отметок до загрузки
+        ])
+        file_input = MagicMock()
+        file_input.count = AsyncMock(return_value=2)
+        file_input.nth.return_value.set_input_files = AsyncMock()
+        overlay = MagicMock(count=AsyncMock(return_value=0))
+        page.locator.side_effect = lambda sel: overlay if "Overlay" in sel else file_input
+
+        with patch("src.scraper.file_handler.asyncio.sleep", new_callable=AsyncMock) as sleep:
+            ok = await upload_file(page, "555", Path("/tmp/work.docx"))
+
+        assert ok is True
+        sleep.assert_not_awaited()
+        file_input.nth.return_value.set_input_files.assert_awaited_once_with(str(Path("/tmp/work.docx")))
+        waits = [c.args[0] for c in page.wait_for_function.await_args_list]
+        assert waits == [_UPLOAD_INPUT_READY, _UPLOAD_DONE]
+        # Ждём роста числа отметок относительно снимка до set_input_files
+        assert page.wait_for_function.await_args_list[1].kwargs["arg"] == 1
+        # Число input'ов подтверждено ожиданием — без лишнего count()
+        file_input.count.assert_not_awaited()
+        # Успех — результат ожидания _UPLOAD_DONE, без отдельного evaluate
+        assert page.evaluate.await_count == 3
+        assert "OrderStyled" in _UPLOAD_DONE
+
+    @pytest.mark.asyncio
+    async def test_upload_not_confirmed_still_succeeds(self):
+        """Новая отметка о файле не появилась за таймаут — файл установлен, считаем загруженным."""
+        from src.scraper.file_handler import upload_file
+
+        page = MagicMock()
+        page.url = "https://avtor24.ru/order/getoneorder/555"
+        page.wait_for_selector = AsyncMock()
+        page.wait_for_function = AsyncMock(side_effect=[None, Exception("Timeout")])
+        page.evaluate = AsyncMock(side_effect=[
+            0,
+            {"selected": True, "text": "Окончательный"},
+            2,
+        ])
+        file_input = MagicMock()
+        file_input.nth.return_value.set_input_files = AsyncMock()
+        overlay = MagicMock(count=AsyncMock(return_value=0))
+        page.locator.side_effect = lambda sel: overlay if "Overlay" in sel else file_input
+
+        ok = await upload_file(page, "555", Path("/tmp/work.docx"))
+
+        assert ok is True
+        file_input.nth.return_value.set_input_files.assert_awaited_once()
+        assert page.wait_for_function.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_upload_falls_back_to_single_input(self):
+        """Второй input не дождались — один count() и загрузка в первый input."""
+        from src.scraper.file_handler import upload_file
+
+        page = MagicMock()
+        page.url = "https://avtor24.ru/order/getoneorder/555"
+        page.keyboard.press = AsyncMock()
+        page.wait_for_selector = AsyncMock()
+        page.wait_for_function = AsyncMock(side_effect=[Exception("Timeout"), None])
+        page.evaluate = AsyncMock(side_effect=[
+            0,
+            {"selected": True, "text": "Окончательный"},
+            0,
+        ])
+        file_input = MagicMock()
+        file_input.count = AsyncMock(return_value=1)
+        file_input.first.set_input_files = AsyncMock()
+        overlay = MagicMock(count=AsyncMock(return_value=0))
+        page.locator.side_effect = lambda sel: overlay if "Overlay" in sel else file_input
+
+        ok = await upload_file(page, "555", Path("/tmp/work.docx"))
+
+        assert ok is True
+        file_input.count.assert_awaited_once()
+        file_input.first.set_input_files.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_variant_fallback_uses_text_engine(self):
+        """Вариант не найден в модалке — клик через locator('li').filter, без JS-перебора."""
+        from src.scraper.file_handler import upload_file
+
+        page = MagicMock()
+        page.url = "https://avtor24.ru/order/getoneorder/555"
+        page.keyboard.press = AsyncMock()
+        page.wait_for_selector = AsyncMock()
+        page.wait_for_function = AsyncMock()
+        page.evaluate = AsyncMock(side_effect=[
+            0,
+            {"error": "Variant not found", "items": 0},
+            0,
+        ])
+        file_input = MagicMock()
+        file_input.nth.return_value.set_input_files = AsyncMock()
+        items = MagicMock()
+        items.filter.return_value.first.click = AsyncMock()
+        overlay = MagicMock(count=AsyncMock(return_value=0))
+        page.locator.side_effect = lambda sel: {"li": items}.get(
+            sel, overlay if "Overlay" in sel else file_input
+        )
+
+        ok = await upload_file(page, "555", Path("/tmp/work.docx"), variant="intermediate")
+
+        assert ok is True
+        items.filter.assert_called_once_with(has_text="Промежуточный")
+        items.filter.return_value.first.click.assert_awaited_once()
+        assert page.evaluate.await_count == 3
+
+
 # ===== Тесты get_waiting_confirmation_order_ids =====
 
 class TestWaitingConfirmation:
@@ -936,7 +2355,7 @@ class TestWaitingConfirmation:
         page = MagicMock()
         page.url = url
         page.goto = AsyncMock()
-        page.evaluate = AsyncMock(side_effect=[True, order_ids])
+        page.evaluate = AsyncMock(side_effect=[True, _order_hrefs(order_ids)])
         return page
 
     @pytest.mark.asyncio
@@ -1076,6 +2495,40 @@ class TestChatMessageAssistant:
         )
         assert msg.is_assistant is True
 
+    def test_is_assistant_precomputed_field(self):
+        """is_assistant — обычный слот, вычисленный при создании, а не property."""
+        msg = ChatMessage(order_id="1", text="x", is_incoming=True, sender_name="АССИСТЕНТ")
+        assert "is_assistant" in ChatMessage.__slots__
+        assert not isinstance(ChatMessage.__dict__.get("is_assistant"), property)
+        assert msg.is_assistant is True
+
+    def test_chat_message_uses_slots(self):
+        """ChatMessage без __dict__, file_urls по умолчанию — новый пустой список."""
+        a = ChatMessage(order_id="1", text="a", is_incoming=True)
+        b = ChatMessage(order_id="1", text="b", is_incoming=True)
+        assert not hasattr(a, "__dict__")
+        assert a.file_urls == []
+        assert a.file_urls is not b.file_urls
+
+    @pytest.mark.asyncio
+    async def test_get_messages_system_not_incoming(self):
+        """Системное сообщение: is_incoming=False даже без isOutgoing."""
+        page = MagicMock()
+        page.url = "https://avtor24.ru/order/getoneorder/10001"
+        page.evaluate = AsyncMock(return_value=json.dumps(_packed_messages([
+            {"text": "Вас выбрали автором", "isSystem": True, "isOutgoing": False},
+            {"text": "Файл", "isSystem": False, "hasFiles": True, "fileUrls": ["https://a/f.docx"]},
+        ])))
+
+        messages = await get_messages(page, "10001")
+
+        assert messages[0].is_system is True
+        assert messages[0].is_incoming is False
+        assert messages[0].file_urls == []
+        assert messages[1].is_incoming is True
+        assert messages[1].has_files is True
+        assert messages[1].sender_name is None
+
     def test_get_messages_includes_sender_name(self):
         """get_messages сохраняет sender_name из JS evaluate."""
         msg = ChatMessage(
@@ -1087,6 +2540,29 @@ class TestChatMessageAssistant:
         assert msg.sender_name == "Ассистент"
         assert msg.is_assistant is True
 
+    @pytest.mark.asyncio
+    async def test_get_messages_decodes_packed_columns(self):
+        """Флаги и разреженные files раскладываются по своим сообщениям."""
+        page = MagicMock()
+        page.url = "https://avtor24.ru/order/getoneorder/10001"
+        page.evaluate = AsyncMock(return_value=json.dumps({
+            "texts": ["Системное", "Наше", "С файлом"],
+            "flags": [1, 2, 0],
+            "timestamps": ["", "10:00", "10:05"],
+            "senders": ["", "", "Иван"],
+            "files": {"2": ["https://a/1.docx", "https://a/2.pdf"]},
+        }))
+
+        messages = await get_messages(page, "10001")
+
+        assert [(m.is_system, m.is_incoming) for m in messages] == [
+            (True, False), (False, False), (False, True),
+        ]
+        assert [m.has_files for m in messages] == [False, False, True]
+        assert messages[2].file_urls == ["https://a/1.docx", "https://a/2.pdf"]
+        assert messages[2].sender_name == "Иван"
+        assert messages[1].timestamp == "10:00"
+
     @pytest.mark.asyncio
     async def test_get_messages_parses_sender_name(self):
         """get_messages передаёт senderName из JS evaluate в ChatMessage."""
@@ -1114,7 +2590,7 @@ class TestChatMessageAssistant:
                 "fileUrls": [],
             },
         ]
-        page.evaluate = AsyncMock(return_value=js_result)
+        page.evaluate = AsyncMock(return_value=json.dumps(_packed_messages(js_result)))
 
         chat_tab = MagicMock()
         chat_tab.count = AsyncMock(return_value=0)
@@ -1154,6 +2630,14 @@ class TestUtils:
         assert _extract_float("14") == 14.0
         assert _extract_float("нет") is None
 
+    def test_field_parsers_cached(self):
+        """Повтор того же значения поля — из lru_cache, без повторного разбора."""
+        _extract_int.cache_clear()
+        assert _extract_int("14 пт") == 14
+        assert _extract_int("14 пт") == 14
+        info = _extract_int.cache_info()
+        assert (info.hits, info.misses) == (1, 1)
+
 
 # ===== Тест дедупликации через БД =====
 
@@ -1223,81 +2707,56 @@ class TestSessionManagement:
 class TestCancelOrder:
     """Тесты отмены заказа через cancel_order()."""
 
-    @pytest.mark.asyncio
-    async def test_cancel_order_success(self):
-        """Успешная отмена: кнопка найдена, модалка подтверждена."""
+    @staticmethod
+    def _make_page(url, click_result):
+        """Мок страницы: clickWithModal возвращает click_result."""
         page = MagicMock()
-        page.url = "https://avtor24.ru/order/getoneorder/999"
+        page.url = url
         page.goto = AsyncMock()
+        page.evaluate = AsyncMock(return_value=click_result)
 
-        # Кнопка "Отменить" найдена
-        cancel_btn = MagicMock()
-        cancel_btn.count = AsyncMock(return_value=1)
-        cancel_btn.first = MagicMock()
-        cancel_btn.first.click = AsyncMock()
-
-        # Модалка подтверждения найдена
-        modal_btn = MagicMock()
-        modal_btn.count = AsyncMock(return_value=1)
-        modal_btn.first = MagicMock()
-        modal_btn.first.click = AsyncMock()
-
-        # Оверлей
         overlay = MagicMock()
         overlay.count = AsyncMock(return_value=0)
-
-        def locator_router(selector):
-            if "Отменить" in selector or "Отказаться" in selector:
-                return cancel_btn
-            if "alertModal" in selector or "Modal" in selector:
-                return modal_btn
-            if "Overlay" in selector:
-                return overlay
-            m = MagicMock()
-            m.count = AsyncMock(return_value=0)
-            return m
-
-        page.locator = MagicMock(side_effect=locator_router)
+        page.locator = MagicMock(return_value=overlay)
         page.keyboard = MagicMock()
         page.keyboard.press = AsyncMock()
+        return page
+
+    @staticmethod
+    def _clicked_cascades(page):
+        """Аргументы, переданные в window.__a24.clickWithModal."""
+        return [
+            c.args[1] for c in page.evaluate.await_args_list
+            if "clickWithModal" in c.args[0]
+        ]
+
+    @pytest.mark.asyncio
+    async def test_cancel_order_success(self):
+        """Успешная отмена: кнопка и подтверждение в модалке — один evaluate."""
+        page = self._make_page("https://avtor24.ru/order/getoneorder/999", 0)
 
         with patch("src.scraper.chat.asyncio.sleep", new_callable=AsyncMock):
             result = await cancel_order(page, "999")
 
         assert result is True
-        cancel_btn.first.click.assert_awaited_once()
+        cascades = self._clicked_cascades(page)
+        assert len(cascades) == 1
+        assert "Отменить" in cascades[0]["button"][0]["labels"]
+        assert "alertModal" in cascades[0]["modalSteps"][0]["scope"]
+        page.evaluate.assert_awaited_once()
+        # Поиск и клик — без locator.count()
+        page.locator.assert_called_once_with('[class*="Overlay"]')
 
     @pytest.mark.asyncio
     async def test_cancel_order_button_not_found(self):
         """Кнопка 'Отменить' не найдена — возвращает False."""
-        page = MagicMock()
-        page.url = "https://avtor24.ru/order/getoneorder/888"
-        page.goto = AsyncMock()
-
-        # Кнопка не найдена
-        cancel_btn = MagicMock()
-        cancel_btn.count = AsyncMock(return_value=0)
-
-        overlay = MagicMock()
-        overlay.count = AsyncMock(return_value=0)
-
-        def locator_router(selector):
-            if "Отменить" in selector or "Отказаться" in selector:
-                return cancel_btn
-            if "Overlay" in selector:
-                return overlay
-            m = MagicMock()
-            m.count = AsyncMock(return_value=0)
-            return m
-
-        page.locator = MagicMock(side_effect=locator_router)
-        page.keyboard = MagicMock()
-        page.keyboard.press = AsyncMock()
+        page = self._make_page("https://avtor24.ru/order/getoneorder/888", -2)
 
         with patch("src.scraper.chat.asyncio.sleep", new_callable=AsyncMock):
             result = await cancel_order(page, "888")
 
         assert result is False
+        page.locator.assert_not_called()
 
     @pytest.mark.asyncio
     async def test_cancel_order_exception_returns_false(self):
@@ -1312,48 +2771,40 @@ class TestCancelOrder:
         assert result is False
 
     @pytest.mark.asyncio
-    async def test_cancel_order_fallback_confirm(self):
-        """Если alertModal не найден — ищет любую кнопку подтверждения."""
-        page = MagicMock()
-        page.url = "https://avtor24.ru/order/getoneorder/666"
-        page.goto = AsyncMock()
+    async def test_cancel_order_no_modal_still_succeeds(self):
+        """Модалка не появилась (-1) — отмена считается выполненной."""
+        page = self._make_page("https://avtor24.ru/order/getoneorder/666", -1)
 
-        cancel_btn = MagicMock()
-        cancel_btn.count = AsyncMock(return_value=1)
-        cancel_btn.first = MagicMock()
-        cancel_btn.first.click = AsyncMock()
+        with patch("src.scraper.chat.asyncio.sleep", new_callable=AsyncMock):
+            result = await cancel_order(page, "666")
 
-        # Модалка НЕ найдена
-        modal_btn = MagicMock()
-        modal_btn.count = AsyncMock(return_value=0)
+        assert result is True
+        modal_steps = self._clicked_cascades(page)[0]["modalSteps"]
+        assert modal_steps[1]["scope"] is None
+        assert "Подтвердить" in modal_steps[1]["labels"]
 
-        # Fallback — любая кнопка "Подтвердить"/"Да"
-        fallback_btn = MagicMock()
-        fallback_btn.count = AsyncMock(return_value=1)
-        fallback_btn.first = MagicMock()
-        fallback_btn.first.click = AsyncMock()
+    @pytest.mark.asyncio
+    async def test_confirm_order_modal_cascade_single_evaluate(self):
+        """confirm_order: кнопка, ожидание модалки и её каскад — один evaluate."""
+        page = self._make_page("https://avtor24.ru/order/getoneorder/555", 3)
 
-        overlay = MagicMock()
-        overlay.count = AsyncMock(return_value=0)
+        with patch("src.scraper.chat.asyncio.sleep", new_callable=AsyncMock):
+            result = await confirm_order(page, "555")
 
-        def locator_router(selector):
-            if "Отменить" in selector or "Отказаться" in selector:
-                return cancel_btn
-            if "alertModal" in selector:
-                return modal_btn
-            if "Подтвердить" in selector and "Modal" not in selector and "alertModal" not in selector:
-                return fallback_btn
-            if "Overlay" in selector:
-                return overlay
-            m = MagicMock()
-            m.count = AsyncMock(return_value=0)
-            return m
+        assert result is True
+        cascades = self._clicked_cascades(page)
+        assert len(cascades) == 1
+        assert cascades[0]["modalSelector"] == '[data-testid*="alertModal"], [class*="Modal"]'
+        # Последний шаг — вторая кнопка "Подтвердить" на странице
+        assert cascades[0]["modalSteps"][-1] == {"scope": None, "labels": ["Подтвердить"], "nth": 1}
 
-        page.locator = MagicMock(side_effect=locator_router)
-        page.keyboard = MagicMock()
-        page.keyboard.press = AsyncMock()
+    @pytest.mark.asyncio
+    async def test_confirm_order_button_not_found(self):
+        """Кнопки 'Подтвердить' нет — False."""
+        page = self._make_page("https://avtor24.ru/order/getoneorder/444", -2)
 
         with patch("src.scraper.chat.asyncio.sleep", new_callable=AsyncMock):
-            result = await cancel_order(page, "666")
+            result = await confirm_order(page, "444")
 
-        assert result is True
+        assert result is False
+        page.evaluate.assert_awaited_once()